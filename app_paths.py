@@ -0,0 +1,17 @@
+import os
+import sys
+
+
+def data_dir():
+    # Dossier des données persistantes (cache, index, journal)
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        path = os.path.join(base, 'YouTubeDownloader')
+    else:
+        path = os.path.join(os.path.expanduser('~'), '.youtube_downloader')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_path(name):
+    return os.path.join(data_dir(), name)
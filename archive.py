@@ -0,0 +1,74 @@
+import sqlite3
+import threading
+import time
+from app_paths import data_path
+
+VIDEO = 'video'
+AUDIO = 'audio'
+
+
+def entry_key(entry):
+    # Entrée complète (extractor_key) ou entrée « plate » d'une playlist (ie_key)
+    extractor = entry.get('extractor_key') or entry.get('ie_key')
+    if extractor and entry.get('id'):
+        return f"{extractor}:{entry['id']}"
+    return None
+
+
+class DownloadArchive:
+    # Index persistant des vidéos déjà téléchargées : consulté avant toute requête média,
+    # une synchronisation de playlist ne touche que les nouvelles entrées
+    def __init__(self, path=None):
+        self.path = path or data_path('download_archive.sqlite3')
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS downloads (
+                                key TEXT NOT NULL,
+                                kind TEXT NOT NULL,
+                                title TEXT,
+                                format TEXT,
+                                path TEXT,
+                                downloaded REAL NOT NULL,
+                                PRIMARY KEY (key, kind))""")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def contains(self, key, kind=VIDEO):
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM downloads WHERE key = ? AND kind = ?", (key, kind)).fetchone()
+        return row is not None
+
+    def known_keys(self, keys, kind=VIDEO):
+        # Une requête par lot de clés plutôt qu'une par entrée de la playlist
+        keys = list(keys)
+        found = set()
+        with self._lock, self._connect() as conn:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(f"SELECT key FROM downloads WHERE kind = ? AND key IN ({placeholders})",
+                                    [kind] + batch).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def record(self, key, kind=VIDEO, title=None, format=None, path=None):
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO downloads (key, kind, title, format, path, downloaded) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (key, kind, title, format, path, time.time()))
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM downloads")
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_download_archive():
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = DownloadArchive()
+        return _archive
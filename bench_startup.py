@@ -0,0 +1,74 @@
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Modules lourds qui ne doivent pas être chargés avant la première utilisation
+HEAVY_MODULES = ('yt_dlp', 'requests', 'packaging', 'moviepy', 'numpy', 'imageio')
+
+
+def measure_child():
+    # Exécuté dans un interpréteur neuf : import de l'interface puis affichage de la fenêtre
+    import test2
+    imported = time.perf_counter()
+
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication(sys.argv[:1])
+    window = test2.YouTubeDownloader()
+    window.show()
+    app.processEvents()
+    shown = time.perf_counter()
+
+    print(json.dumps({
+        'import_ms': (imported - _STARTED) * 1000,
+        'window_ms': (shown - _STARTED) * 1000,
+        'heavy_modules': sorted(name for name in HEAVY_MODULES if name in sys.modules),
+    }))
+    sys.stdout.flush()
+    os._exit(0)  # Pas d'attente des threads Qt : seul le démarrage est mesuré
+
+
+def run_once(sandbox):
+    env = dict(os.environ)
+    # Réglages, cache et journal isolés : le lancement ne reprend pas les vrais travaux
+    env.update({'HOME': sandbox, 'LOCALAPPDATA': sandbox, 'XDG_CONFIG_HOME': sandbox})
+    if sys.platform.startswith('linux') and not env.get('DISPLAY'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure du temps de démarrage de l'interface")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        measure_child()
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as sandbox:
+        for _ in range(args.runs):
+            results.append(run_once(sandbox))
+
+    for key, label in (('import_ms', "Import de test2"), ('window_ms', "Fenêtre affichée")):
+        values = [result[key] for result in results]
+        print(f"{label} : médiane {statistics.median(values):.0f} ms, min {min(values):.0f} ms, "
+              f"max {max(values):.0f} ms ({len(values)} lancements)")
+    heavy = sorted({name for result in results for name in result['heavy_modules']})
+    print(f"Modules lourds chargés au démarrage : {', '.join(heavy) if heavy else 'aucun'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+# Point d'entrée sans interface graphique (serveurs, cron) : n'importe jamais PyQt5.
+# Les options par défaut sont lues dans le fichier de réglages écrit par QSettings et la
+# progression est émise en JSON, une ligne par événement, sur la sortie standard.
+import argparse
+import concurrent.futures
+import configparser
+import json
+import multiprocessing
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from conversion import CONVERSION_FORMATS, DEFAULT_PRESET, PRESETS
+from formats import AUDIO_CODECS
+
+SETTINGS_ORGANIZATION = 'YourCompany'
+SETTINGS_APPLICATION = 'YouTubeDownloader'
+INI_ESCAPES = {'a': '\a', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v', '0': '\0',
+               '"': '"', "'": "'", '\\': '\\', '?': '?'}
+
+
+def settings_file():
+    config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(config_home, SETTINGS_ORGANIZATION, f'{SETTINGS_APPLICATION}.conf')
+
+
+def unescape_ini_value(value):
+    # Échappements de QSettings (format INI) : \xNNNN pour les caractères non ASCII, \\ et \",
+    # guillemets autour des valeurs contenant espaces, virgules ou caractères spéciaux
+    if value.startswith('@@'):
+        value = value[1:]
+    result = []
+    index = 0
+    while index < len(value):
+        char = value[index]
+        if char == '"':
+            index += 1
+            continue
+        if char == '\\' and index + 1 < len(value):
+            escaped = value[index + 1]
+            if escaped == 'x':
+                match = re.match(r'[0-9a-fA-F]{1,4}', value[index + 2:])
+                if match:
+                    result.append(chr(int(match.group(), 16)))
+                    index += 2 + match.end()
+                    continue
+            elif escaped in INI_ESCAPES:
+                result.append(INI_ESCAPES[escaped])
+                index += 2
+                continue
+        result.append(char)
+        index += 1
+    return ''.join(result)
+
+
+def read_settings():
+    # Mêmes clés que QSettings("YourCompany", "YouTubeDownloader") : registre sous Windows,
+    # fichier INI (section [General]) ailleurs
+    if sys.platform == 'win32':
+        import winreg
+
+        values = {}
+        try:
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER,
+                                rf'Software\{SETTINGS_ORGANIZATION}\{SETTINGS_APPLICATION}') as key:
+                index = 0
+                while True:
+                    try:
+                        name, value, _ = winreg.EnumValue(key, index)
+                    except OSError:
+                        break
+                    values[name] = value
+                    index += 1
+        except OSError:
+            pass
+        return values
+
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.optionxform = str
+    try:
+        parser.read(settings_file(), encoding='utf-8')
+    except configparser.Error:
+        return {}
+    if not parser.has_section('General'):
+        return {}
+    return {key: unescape_ini_value(value) for key, value in parser.items('General')}
+
+
+def setting_bool(settings, key, default=False):
+    value = settings.get(key)
+    if value is None:
+        return default
+    return value in (True, 'true', 1, '1')
+
+
+def setting_int(settings, key, default=0):
+    try:
+        return int(settings.get(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class Shutdown:
+    # Demande d'arrêt (SIGINT/SIGTERM) relayée aux travaux en cours
+    def __init__(self):
+        self.event = threading.Event()
+        self.callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def requested(self):
+        return self.event.is_set()
+
+    def on_request(self, callback):
+        with self._lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return True
+        return False
+
+    def request(self):
+        with self._lock:
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class JsonReporter:
+    def __init__(self, stream=sys.stdout):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps(dict(event=event, time=round(time.time(), 3), **fields), ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+def read_urls(urls, batch_file):
+    urls = list(urls)
+    if batch_file:
+        handle = sys.stdin if batch_file == '-' else open(batch_file, encoding='utf-8')
+        with handle:
+            for line in handle:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    urls.append(line)
+    return urls
+
+
+def build_parser(settings):
+    parser = argparse.ArgumentParser(prog='cli.py', description="Téléchargeur YouTube sans interface graphique")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    download = commands.add_parser('download', help="télécharger des vidéos ou des playlists")
+    download.add_argument('urls', nargs='*', help="URL à télécharger")
+    download.add_argument('-a', '--batch-file', help="fichier d'URL, une par ligne ('-' pour l'entrée standard)")
+    download.add_argument('-o', '--output', default=settings.get('default_save_path') or os.getcwd(),
+                          help="dossier de destination")
+    download.add_argument('-q', '--quality', default=settings.get('default_quality', 'best'))
+    download.add_argument('--playlist', action='store_true', help="télécharger la playlist entière")
+    download.add_argument('-x', '--extract-audio', action='store_true')
+    download.add_argument('--audio-codec', default='mp3', choices=AUDIO_CODECS)
+    download.add_argument('--convert', metavar='FORMAT', choices=CONVERSION_FORMATS,
+                          help="convertir chaque fichier téléchargé (%(choices)s)")
+    download.add_argument('-j', '--jobs', type=int, default=setting_int(settings, 'max_downloads', 1),
+                          help="téléchargements simultanés")
+    download.add_argument('--connections', type=int, default=setting_int(settings, 'connections_per_file', 1))
+    download.add_argument('--fragments', type=int, default=setting_int(settings, 'fragment_connections', 4))
+    download.add_argument('--limit-rate', type=int, metavar='KIO',
+                          default=setting_int(settings, 'bandwidth_total', 0), help="débit total maximum (Kio/s)")
+    download.add_argument('--limit-rate-per-job', type=int, metavar='KIO',
+                          default=setting_int(settings, 'bandwidth_per_job', 0))
+    download.add_argument('--archive', dest='archive', action='store_true',
+                          default=setting_bool(settings, 'use_download_archive'),
+                          help="ignorer les vidéos déjà téléchargées")
+    download.add_argument('--no-archive', dest='archive', action='store_false')
+    download.add_argument('--discard-partial', action='store_true',
+                          default=not setting_bool(settings, 'keep_partial_files', True))
+
+    convert = commands.add_parser('convert', help="convertir des fichiers ou des dossiers")
+    convert.add_argument('inputs', nargs='+', help="fichiers ou dossiers à convertir")
+    convert.add_argument('-f', '--format', required=True, choices=CONVERSION_FORMATS)
+    convert.add_argument('-o', '--output', help="dossier de destination (par défaut : à côté de la source)")
+    convert.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1)
+    convert.add_argument('--threads', type=int, default=setting_int(settings, 'conversion_threads', 0))
+    convert.add_argument('--preset', default=settings.get('conversion_preset', DEFAULT_PRESET), choices=PRESETS)
+    return parser
+
+
+def run_downloads(args, settings, reporter, shutdown):
+    urls = read_urls(args.urls, args.batch_file)
+    if not urls:
+        reporter.emit('error', message="Aucune URL à télécharger")
+        return 2
+
+    # Imports différés : --help et les erreurs d'arguments restent instantanés
+    from download_core import DownloadEngine
+    from pipeline import ConversionPipeline
+    from ratelimit import get_bandwidth_limiter, parse_schedule
+
+    try:
+        schedule = parse_schedule(settings.get('bandwidth_schedule', ''))
+    except ValueError as e:
+        reporter.emit('message', message=str(e))
+        schedule = []
+    limiter = get_bandwidth_limiter()
+    limiter.set_limits(args.limit_rate * 1024, args.limit_rate_per_job * 1024)
+    limiter.set_schedule(schedule)
+
+    conversion_failures = []
+
+    def on_conversion_status(input_file, status, message):
+        if status == 'failed':
+            conversion_failures.append(input_file)
+        reporter.emit('conversion', file=input_file, status=status, message=message)
+
+    pipeline = None
+    if args.convert:
+        pipeline = ConversionPipeline(
+            threads=setting_int(settings, 'conversion_threads', 0),
+            preset=settings.get('conversion_preset', DEFAULT_PRESET),
+            on_status=on_conversion_status)
+        pipeline.start()
+
+    def download(index, url):
+        on_file_ready = None
+        if pipeline:
+            on_file_ready = lambda filepath, cancel_token: pipeline.submit(filepath, args.convert, cancel_token)
+        engine = DownloadEngine(
+            url, args.output, args.quality, args.playlist, args.extract_audio, args.audio_codec,
+            on_progress=lambda progress, speed, eta, remaining: reporter.emit(
+                'progress', index=index, url=url, progress=round(progress, 2), speed=speed, eta=eta,
+                remaining=remaining),
+            on_message=lambda message: reporter.emit('message', index=index, url=url, message=message),
+            keep_partial=not args.discard_partial, on_file_ready=on_file_ready,
+            connections=args.connections, fragment_connections=args.fragments, use_archive=args.archive)
+        if not shutdown.on_request(engine.stop):
+            return False
+        reporter.emit('started', index=index, url=url)
+        try:
+            if engine.run():
+                reporter.emit('finished', index=index, url=url)
+                return True
+            reporter.emit('stopped', index=index, url=url)
+        except Exception as e:
+            reporter.emit('error', index=index, url=url, message=str(e))
+        return False
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as executor:
+        results = list(executor.map(download, range(len(urls)), urls))
+    if pipeline:
+        pipeline.close(cancel=shutdown.requested)
+    if shutdown.requested:
+        return 130
+    # Une conversion en échec compte comme un téléchargement en échec
+    return 0 if all(results) and not conversion_failures else 1
+
+
+def run_conversions(args, reporter, shutdown):
+    from conversion import BatchConverter, collect_inputs, DEFAULT_NAMING_RULE
+
+    files = collect_inputs(args.inputs)
+    if not files:
+        reporter.emit('error', message="Aucun fichier à convertir")
+        return 2
+    converter = BatchConverter(
+        files, args.output, args.format, DEFAULT_NAMING_RULE, args.jobs, args.threads, args.preset,
+        on_status=lambda input_file, status, message: reporter.emit(
+            'conversion', file=input_file, status=status, message=message),
+        on_throughput=lambda done, failed, total, bytes_per_second: reporter.emit(
+            'throughput', done=done, failed=failed, total=total, bytes_per_second=bytes_per_second))
+    shutdown.on_request(converter.cancel)
+    done, failed = converter.run()
+    reporter.emit('summary', done=done, failed=failed)
+    if shutdown.requested:
+        return 130
+    return 0 if not failed else 1
+
+
+def main(argv=None):
+    settings = read_settings()
+    args = build_parser(settings).parse_args(argv)
+    reporter = JsonReporter()
+    shutdown = Shutdown()
+    # Arrêt propre : les fichiers .part sont conservés pour une reprise ultérieure
+    signal.signal(signal.SIGINT, lambda signum, frame: shutdown.request())
+    signal.signal(signal.SIGTERM, lambda signum, frame: shutdown.request())
+    if args.command == 'download':
+        return run_downloads(args, settings, reporter, shutdown)
+    return run_conversions(args, reporter, shutdown)
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
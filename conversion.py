@@ -0,0 +1,398 @@
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from cancel import CancelToken, Cancelled
+
+# Évite l'ouverture d'une console pour chaque processus ffmpeg sous Windows
+SUBPROCESS_FLAGS = subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+
+# Codecs que chaque conteneur accepte en copie de flux (None = tous)
+CONTAINER_CODECS = {
+    'mp4': {
+        'video': {'h264', 'hevc', 'av1', 'vp9', 'mpeg4'},
+        'audio': {'aac', 'mp3', 'alac', 'opus', 'flac', 'ac3', 'eac3'},
+    },
+    'mkv': {
+        'video': None,
+        'audio': None,
+    },
+    'avi': {
+        'video': {'h264', 'mpeg4', 'mjpeg', 'msmpeg4v3'},
+        'audio': {'mp3', 'ac3', 'pcm_s16le'},
+    },
+    'mp3': {
+        'video': set(),
+        'audio': {'mp3'},
+    },
+}
+
+# Formats de sortie proposés (interface et ligne de commande)
+CONVERSION_FORMATS = ['mp4', 'avi', 'mkv', 'mp3']
+
+PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow']
+DEFAULT_PRESET = 'medium'
+
+MEDIA_EXTENSIONS = ('.mp4', '.mkv', '.webm', '.avi', '.mov', '.flv', '.m4a', '.mp3', '.opus', '.ogg', '.wav')
+DEFAULT_NAMING_RULE = '{name}.{format}'
+
+# En dessous de cette durée, le découpage coûte plus qu'il ne rapporte
+MIN_SEGMENT_DURATION = 30
+MIN_SEGMENTED_DURATION = 10 * 60
+
+# Encodeurs utilisés quand la copie n'est pas possible
+TRANSCODE_CODECS = {
+    'mp4': {'video': 'libx264', 'audio': 'aac'},
+    'mkv': {'video': 'libx264', 'audio': 'aac'},
+    'avi': {'video': 'libx264', 'audio': 'libmp3lame'},
+    'mp3': {'video': None, 'audio': 'libmp3lame'},
+}
+
+
+def find_ffmpeg():
+    path = shutil.which('ffmpeg')
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        raise RuntimeError("ffmpeg est introuvable")
+
+
+def parse_timestamp(value):
+    hours, minutes, seconds = value.split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def probe_streams(path):
+    ffprobe = shutil.which('ffprobe')
+    if ffprobe:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-show_entries', 'stream=index,codec_type,codec_name:format=duration',
+             '-of', 'json', path],
+            capture_output=True, text=True, check=True, creationflags=SUBPROCESS_FLAGS)
+        data = json.loads(result.stdout)
+        duration = data.get('format', {}).get('duration')
+        return {
+            'duration': float(duration) if duration else None,
+            'streams': [{'index': stream['index'], 'codec_type': stream.get('codec_type'),
+                         'codec_name': stream.get('codec_name')} for stream in data.get('streams', [])],
+        }
+
+    # Sans ffprobe (ffmpeg d'imageio), on lit la description affichée par ffmpeg -i
+    result = subprocess.run([find_ffmpeg(), '-hide_banner', '-i', path],
+                            capture_output=True, text=True, errors='replace', creationflags=SUBPROCESS_FLAGS)
+    duration_match = re.search(r'Duration: (\d+:\d+:\d+(?:\.\d+)?)', result.stderr)
+    streams = []
+    for match in re.finditer(r'Stream #0:(\d+)[^:]*: (Video|Audio|Subtitle|Data): (\w+)', result.stderr):
+        streams.append({'index': int(match.group(1)), 'codec_type': match.group(2).lower(),
+                        'codec_name': match.group(3)})
+    if not streams:
+        raise RuntimeError(f"Impossible d'analyser le fichier d'entrée : {path}")
+    return {
+        'duration': parse_timestamp(duration_match.group(1)) if duration_match else None,
+        'streams': streams,
+    }
+
+
+class ConversionPlan:
+    def __init__(self, target_format, video_codec, audio_codec, duration):
+        self.target_format = target_format
+        self.video_codec = video_codec
+        self.audio_codec = audio_codec
+        self.duration = duration
+
+    @property
+    def is_remux(self):
+        # Aucun flux à réencoder : simple changement de conteneur
+        return self.video_codec in (None, 'copy') and self.audio_codec in (None, 'copy')
+
+    def ffmpeg_args(self, ffmpeg, input_file, output_file, threads=0, preset=DEFAULT_PRESET):
+        # -progress pipe:1 produit un état lisible par machine sur stdout
+        args = [ffmpeg, '-y', '-hide_banner', '-nostats', '-progress', 'pipe:1', '-i', input_file]
+        if self.video_codec:
+            args += ['-map', '0:v:0', '-c:v', self.video_codec]
+        else:
+            args += ['-vn']
+        if self.audio_codec:
+            args += ['-map', '0:a:0', '-c:a', self.audio_codec]
+        else:
+            args += ['-an']
+        if self.audio_codec == 'libmp3lame':
+            args += ['-b:a', '192k']
+        if self.video_codec == 'libx264':
+            args += ['-preset', preset]
+        if not self.is_remux:
+            args += ['-threads', str(threads)]
+        return args + [output_file]
+
+
+def plan_conversion(probe, target_format):
+    allowed = CONTAINER_CODECS[target_format]
+    encoders = TRANSCODE_CODECS[target_format]
+    video = next((s for s in probe['streams'] if s['codec_type'] == 'video'), None)
+    audio = next((s for s in probe['streams'] if s['codec_type'] == 'audio'), None)
+
+    def choose(stream, kind):
+        if stream is None or not encoders[kind]:
+            return None
+        if allowed[kind] is None or stream['codec_name'] in allowed[kind]:
+            return 'copy'
+        return encoders[kind]
+
+    video_codec = choose(video, 'video')
+    audio_codec = choose(audio, 'audio')
+    if video_codec is None and audio_codec is None:
+        raise RuntimeError("Aucun flux compatible avec le format de sortie")
+    return ConversionPlan(target_format, video_codec, audio_codec, probe['duration'])
+
+
+def run_ffmpeg(args, duration=None, on_progress=None, cancel_token=None):
+    process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, errors='replace', creationflags=SUBPROCESS_FLAGS)
+
+    # stderr est vidé en parallèle pour ne pas bloquer ffmpeg ; on garde la fin pour les erreurs
+    stderr_tail = collections.deque(maxlen=20)
+    stderr_thread = threading.Thread(target=lambda: stderr_tail.extend(process.stderr), daemon=True)
+    stderr_thread.start()
+
+    try:
+        for line in process.stdout:
+            if cancel_token and cancel_token.cancelled:
+                process.terminate()
+                break
+            key, _, value = line.strip().partition('=')
+            # out_time_ms est lui aussi exprimé en microsecondes (ancien nom du champ)
+            if key in ('out_time_us', 'out_time_ms') and duration and on_progress and value.isdigit():
+                on_progress(min(int(value) / 1e6 / duration * 100, 100))
+        process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        stderr_thread.join(1)
+
+    if cancel_token and cancel_token.cancelled:
+        raise Cancelled()
+    if process.returncode != 0:
+        raise RuntimeError(stderr_tail[-1].strip() if stderr_tail else "Échec de ffmpeg")
+
+
+def convert_file(input_file, output_file, target_format, threads=0, preset=DEFAULT_PRESET,
+                 on_progress=None, cancel_token=None):
+    plan = plan_conversion(probe_streams(input_file), target_format)
+    try:
+        run_ffmpeg(plan.ffmpeg_args(find_ffmpeg(), input_file, output_file, threads, preset),
+                   plan.duration, on_progress, cancel_token)
+    except Cancelled:
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        raise
+    return plan
+
+
+def convert_segmented(input_file, output_file, target_format, threads=0, preset=DEFAULT_PRESET,
+                      on_progress=None, cancel_token=None, workers=None):
+    probe = probe_streams(input_file)
+    plan = plan_conversion(probe, target_format)
+    duration = plan.duration or 0
+    if plan.video_codec in (None, 'copy') or duration < MIN_SEGMENTED_DURATION:
+        # Rien à paralléliser : pas de vidéo à réencoder ou fichier trop court
+        return convert_file(input_file, output_file, target_format, threads, preset, on_progress, cancel_token)
+
+    # Un jeton local permet d'arrêter les autres segments si l'un échoue
+    cancel_token = cancel_token or CancelToken()
+    cpu_count = os.cpu_count() or 1
+    threads_per_segment = threads or 1
+    workers = workers or max(1, cpu_count // threads_per_segment)
+    segment_time = max(MIN_SEGMENT_DURATION, duration / (workers * 2))
+    ffmpeg = find_ffmpeg()
+    workdir = tempfile.mkdtemp(prefix='segments_', dir=os.path.dirname(os.path.abspath(output_file)))
+
+    try:
+        # 1. Découpage sans réencodage ; en copie de flux, les coupes tombent sur les images clés
+        run_ffmpeg([ffmpeg, '-y', '-hide_banner', '-nostats', '-progress', 'pipe:1', '-i', input_file,
+                    '-map', '0:v:0', '-an', '-c', 'copy', '-f', 'segment', '-segment_time', f'{segment_time:.3f}',
+                    '-reset_timestamps', '1', os.path.join(workdir, 'source_%05d.mkv')],
+                   cancel_token=cancel_token)
+        sources = sorted(name for name in os.listdir(workdir) if name.startswith('source_'))
+        durations = [probe_streams(os.path.join(workdir, name))['duration'] or 0 for name in sources]
+        total = sum(durations) or duration
+
+        done = [0.0] * len(sources)
+        lock = threading.Lock()
+
+        def segment_progress(index, percent):
+            with lock:
+                done[index] = durations[index] * percent / 100
+                if on_progress:
+                    on_progress(min(sum(done) / total * 100, 100))
+
+        video_plan = ConversionPlan(target_format, plan.video_codec, None, None)
+        tasks = []
+        for index, name in enumerate(sources):
+            args = video_plan.ffmpeg_args(ffmpeg, os.path.join(workdir, name),
+                                          os.path.join(workdir, f'encoded_{index:05d}.mkv'),
+                                          threads_per_segment, preset)
+            tasks.append((args, durations[index], lambda percent, index=index: segment_progress(index, percent)))
+
+        # 2. L'audio est traité d'un seul tenant pour éviter les craquements aux jonctions
+        audio_file = None
+        if plan.audio_codec:
+            audio_file = os.path.join(workdir, 'audio.mka')
+            audio_plan = ConversionPlan(target_format, None, plan.audio_codec, None)
+            tasks.append((audio_plan.ffmpeg_args(ffmpeg, input_file, audio_file, 1, preset), None, None))
+
+        # 3. Chaque segment est encodé par son propre processus ffmpeg, sur tous les cœurs
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_ffmpeg, args, seg_duration, callback, cancel_token)
+                       for args, seg_duration, callback in tasks]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+            except BaseException:
+                if cancel_token:
+                    cancel_token.cancel()
+                for future in futures:
+                    future.cancel()
+                raise
+
+        # 4. Concaténation sans perte puis multiplexage avec l'audio
+        list_file = os.path.join(workdir, 'segments.txt')
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for index in range(len(sources)):
+                path = os.path.join(workdir, f'encoded_{index:05d}.mkv').replace("'", "'\\''")
+                f.write(f"file '{path}'\n")
+        args = [ffmpeg, '-y', '-hide_banner', '-nostats', '-progress', 'pipe:1',
+                '-f', 'concat', '-safe', '0', '-i', list_file]
+        if audio_file:
+            args += ['-i', audio_file, '-map', '0:v:0', '-map', '1:a:0']
+        run_ffmpeg(args + ['-c', 'copy', output_file], cancel_token=cancel_token)
+    except Cancelled:
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        raise
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return plan
+
+
+def collect_inputs(paths):
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(MEDIA_EXTENSIONS):
+                    inputs.append(os.path.join(path, name))
+        elif os.path.isfile(path):
+            inputs.append(path)
+    return inputs
+
+
+def output_path(input_file, output_dir, target_format, naming_rule=DEFAULT_NAMING_RULE):
+    name = os.path.splitext(os.path.basename(input_file))[0]
+    output_file = os.path.join(output_dir or os.path.dirname(input_file),
+                               naming_rule.format(name=name, format=target_format))
+    if os.path.abspath(output_file) == os.path.abspath(input_file):
+        # ffmpeg ne peut pas écrire dans son propre fichier d'entrée
+        root, ext = os.path.splitext(output_file)
+        output_file = f"{root}_converti{ext}"
+    return output_file
+
+
+class _EventToken:
+    # Adapte un multiprocessing.Event à l'interface de CancelToken dans les processus du pool
+    def __init__(self, event):
+        self.event = event
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+
+_worker_cancel_token = None
+
+
+def _init_batch_worker(cancel_event):
+    global _worker_cancel_token
+    _worker_cancel_token = _EventToken(cancel_event)
+
+
+def _convert_in_worker(input_file, output_file, target_format, threads, preset):
+    convert_file(input_file, output_file, target_format, threads, preset, cancel_token=_worker_cancel_token)
+    return os.path.getsize(input_file)
+
+
+class BatchConverter:
+    # Les encodages tournent dans un pool de processus : ni le GIL ni l'interface ne sont sollicités
+    def __init__(self, files, output_dir, target_format, naming_rule=DEFAULT_NAMING_RULE, workers=None,
+                 threads=0, preset=DEFAULT_PRESET, on_status=None, on_throughput=None):
+        self.files = list(files)
+        self.output_dir = output_dir
+        self.target_format = target_format
+        self.naming_rule = naming_rule
+        self.workers = workers or max(1, (os.cpu_count() or 1) // 2)
+        self.threads = threads
+        self.preset = preset
+        self.on_status = on_status
+        self.on_throughput = on_throughput
+        self.cancel_event = multiprocessing.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def emit_status(self, input_file, status, message=""):
+        if self.on_status:
+            self.on_status(input_file, status, message)
+
+    def run(self):
+        started = time.monotonic()
+        converted_bytes = 0
+        done = 0
+        failed = 0
+        pending = list(self.files)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=_init_batch_worker,
+                                                    initargs=(self.cancel_event,)) as executor:
+            running = {}
+            while pending or running:
+                # On ne soumet que ce que le pool peut traiter : le statut « en cours » est donc exact
+                while pending and len(running) < self.workers and not self.cancel_event.is_set():
+                    input_file = pending.pop(0)
+                    output_file = output_path(input_file, self.output_dir, self.target_format, self.naming_rule)
+                    future = executor.submit(_convert_in_worker, input_file, output_file, self.target_format,
+                                             self.threads, self.preset)
+                    running[future] = input_file
+                    self.emit_status(input_file, 'running')
+                if self.cancel_event.is_set():
+                    for input_file in pending:
+                        self.emit_status(input_file, 'cancelled')
+                    pending = []
+                if not running:
+                    break
+
+                finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    input_file = running.pop(future)
+                    try:
+                        converted_bytes += future.result()
+                        done += 1
+                        self.emit_status(input_file, 'done')
+                    except Cancelled:
+                        self.emit_status(input_file, 'cancelled')
+                    except Exception as e:
+                        failed += 1
+                        self.emit_status(input_file, 'failed', str(e))
+
+                    if self.on_throughput:
+                        elapsed = time.monotonic() - started
+                        self.on_throughput(done, failed, len(self.files), converted_bytes / elapsed if elapsed else 0)
+        return done, failed
@@ -0,0 +1,401 @@
+import os
+import logging
+import threading
+import time
+import yt_dlp
+from archive import AUDIO, VIDEO, entry_key, get_download_archive
+from cancel import CancelToken, Cancelled
+from journal import get_job_journal
+from metadata_cache import get_metadata_cache, INFO_REUSE_MAX_AGE
+from progress import ByteProgress, ProgressThrottle, expected_bytes
+from ratelimit import get_bandwidth_limiter
+from retry import RetryAbort, retry_call
+from formats import AUDIO_FORMATS, video_format
+from fragments import FragmentPipelineFD, is_fragmented
+from segmented import SegmentedFD, discard_range_state, is_segmentable
+from ydl_pool import get_ydl_pool
+
+
+# Premier bloc lu volontairement petit ; yt-dlp ajuste ensuite la taille des blocs au débit
+# mesuré (environ une seconde de données, 4 Mio au plus). Le hook de progression, qui vérifie
+# l'annulation, passe donc à peu près une fois par seconde, même sur un lien lent
+READ_BLOCK_SIZE = 16 * 1024
+
+
+def transfer_complete(d):
+    total = d.get('total_bytes')
+    return bool(total) and (d.get('downloaded_bytes') or 0) >= total
+
+
+def is_format_file(d):
+    # Fichier d'un format destiné à la fusion (titre.fNNN.ext), supprimé par yt-dlp après le merge
+    info = d.get('info_dict') or {}
+    filename = os.path.basename(d.get('filename') or '')
+    return bool(info.get('format_id')) and f".f{info['format_id']}." in filename
+
+
+class EngineYoutubeDL(yt_dlp.YoutubeDL):
+    # Aiguille les gros fichiers progressifs et les flux fragmentés vers nos téléchargeurs parallèles
+    def __init__(self, params=None, auto_init=True):
+        super().__init__(params, auto_init)
+        self.processed_formats = {}
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if subtitle or test or name == '-':
+            return super().dl(name, info, subtitle, test)
+        if is_segmentable(info, self.params):
+            fd = SegmentedFD(self, self.params)
+        elif is_fragmented(info, self.params):
+            fd = FragmentPipelineFD(self, self.params)
+        else:
+            # Le téléchargeur HTTP de yt-dlp reprendrait un .part préalloué comme s'il était plein
+            discard_range_state(name + '.part')
+            return super().dl(name, info, subtitle, test)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        new_info = dict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
+
+    # yt-dlp consulte l'archive avant toute extraction ou requête média, y compris pour les
+    # entrées de playlists imbriquées : on y branche l'index SQLite
+    def in_download_archive(self, info_dict):
+        archive = self.params.get('sqlite_archive')
+        if archive is None:
+            return super().in_download_archive(info_dict)
+        key = entry_key(info_dict)
+        return key is not None and archive.contains(key, self.params.get('archive_kind', VIDEO))
+
+    def post_process(self, filename, info, files_to_move=None):
+        # Dictionnaire du format réellement téléchargé (fusion comprise), après post-traitement :
+        # format retenu et chemin final, que le dictionnaire de haut niveau archivé n'a pas
+        info = super().post_process(filename, info, files_to_move)
+        key = entry_key(info)
+        if key:
+            self.processed_formats[key] = (info.get('format_id'), info.get('filepath'))
+        return info
+
+    def record_download_archive(self, info_dict):
+        archive = self.params.get('sqlite_archive')
+        if archive is None:
+            return super().record_download_archive(info_dict)
+        key = entry_key(info_dict)
+        if key:
+            format_id, filepath = self.processed_formats.pop(key, (None, None))
+            archive.record(key, self.params.get('archive_kind', VIDEO), info_dict.get('title'),
+                           format_id or info_dict.get('format_id'), filepath or info_dict.get('filepath'))
+
+
+class DownloadPaused(Exception):
+    pass
+
+
+class DownloadCancelled(Cancelled):
+    pass
+
+
+class DownloadEngine:
+    def __init__(self, url, save_path, quality, is_playlist, extract_audio=False, audio_codec='mp3',
+                 on_progress=None, on_message=None, use_cache=True, keep_partial=True, on_file_ready=None,
+                 connections=1, fragment_connections=1, use_archive=False, journal_id=None):
+        self.url = url
+        self.save_path = save_path
+        self.quality = quality
+        self.is_playlist = is_playlist
+        self.extract_audio = extract_audio
+        self.audio_codec = audio_codec
+        self.on_progress = on_progress
+        self.on_message = on_message
+        self.use_cache = use_cache
+        self.keep_partial = keep_partial
+        self.on_file_ready = on_file_ready
+        self.connections = connections
+        self.fragment_connections = fragment_connections
+        self.use_archive = use_archive
+        self.journal_id = journal_id
+        self.current_video = 0
+        self.total_videos = 1
+        self.current_progress = 0
+        self.speed = None
+        self.eta = None
+        self.remaining = None
+        self.aggregate = ByteProgress()
+        self.throttle = ProgressThrottle()
+        self.paused = False
+        self.cancel_token = CancelToken()
+        self.partial_files = set()
+        self._resume_event = threading.Event()
+        self._resume_event.set()
+        # Levé par pause() et stop() : réveille une attente de bande passante en cours
+        self._interrupt = threading.Event()
+        self.ydl = None
+        self.bandwidth = None
+        self.confirm_trial = None
+        self._drawn_bytes = {}
+
+    def build_options(self):
+        # Les sous-titres sont récupérés pendant le même passage que la vidéo
+        video_opts = {
+            'outtmpl': os.path.join(self.save_path, '%(title)s.%(ext)s'),
+            'progress_hooks': [self.progress_hook],
+            'post_hooks': [self.file_ready],
+            'format': video_format(self.quality),
+            'continuedl': True,
+            'buffersize': READ_BLOCK_SIZE,
+            # Au-delà d'une connexion, les gros fichiers progressifs sont découpés en plages
+            'segmented_connections': self.connections,
+            # Flux HLS/DASH : fragments récupérés en parallèle, écrits dans l'ordre
+            'fragment_connections': self.fragment_connections,
+            'concurrent_fragment_downloads': self.fragment_connections,
+            # Nos téléchargeurs parallèles tirent les jetons eux-mêmes, connexion par connexion
+            'bandwidth': self.bandwidth,
+            'writesubtitles': True,
+            'subtitleslangs': ['fr'],
+            'subtitlesformat': 'vtt',
+        }
+
+        if self.extract_audio:
+            video_opts['postprocessors'] = [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': self.audio_codec,
+                'preferredquality': '192',
+            }]
+            video_opts['format'] = AUDIO_FORMATS.get(self.audio_codec, 'bestaudio/best')
+
+        if self.is_playlist:
+            video_opts['yes_playlist'] = True
+            # Entrées de playlist non résolues : chacune l'est juste avant son téléchargement,
+            # sans rafale de requêtes au départ ni URL de formats expirées en fin de travail
+            video_opts['extract_flat'] = 'in_playlist'
+        else:
+            video_opts['noplaylist'] = True
+
+        if self.use_archive:
+            video_opts['sqlite_archive'] = get_download_archive()
+            video_opts['archive_kind'] = AUDIO if self.extract_audio else VIDEO
+        return video_opts
+
+    def cached_info(self):
+        if not self.use_cache or self.is_playlist:
+            return None
+        try:
+            return get_metadata_cache().get_info(self.url)
+        except Exception as e:
+            logging.error(f"Error in MetadataCache: {str(e)}")
+            return None
+
+    def extract(self):
+        info = self.cached_info()
+        if info is None:
+            info = retry_call(lambda: self.ydl.extract_info(self.url, download=False),
+                              self.url, self.wait, self.on_retry)
+        if info is None:
+            # Vidéo déjà dans l'archive : yt-dlp l'a écartée sans requête
+            self.emit_message("Déjà téléchargée, ignorée")
+            return []
+        if 'entries' in info:
+            return self.filter_archived([entry for entry in info['entries'] if entry])
+        return self.filter_archived([info])
+
+    def filter_archived(self, entries):
+        if not self.use_archive:
+            return entries
+        kind = self.ydl.params['archive_kind']
+        keys = [entry_key(entry) for entry in entries]
+        known = get_download_archive().known_keys([key for key in keys if key], kind)
+        new_entries = [entry for entry, key in zip(entries, keys) if key not in known]
+        if len(new_entries) < len(entries):
+            self.emit_message(f"{len(entries) - len(new_entries)} vidéo(s) déjà téléchargée(s), ignorée(s)")
+        return new_entries
+
+    def run(self):
+        self.bandwidth = get_bandwidth_limiter().register()
+        try:
+            return self.download_all()
+        finally:
+            self.bandwidth.close()
+
+    def download_all(self):
+        # Instance YoutubeDL empruntée au pool : extracteurs et cookies déjà initialisés
+        with get_ydl_pool().acquire(self.build_options(), EngineYoutubeDL) as self.ydl:
+            return self.download_entries()
+
+    def download_entries(self):
+        # Une seule extraction de la liste : elle sert au comptage ; chaque entrée de playlist
+        # est résolue par process_ie_result au moment de son téléchargement
+        try:
+            entries = self.planned_entries()
+        except RetryAbort:
+            return False
+        self.total_videos = max(len(entries), 1)
+        self.aggregate.set_entries([expected_bytes(entry) for _, entry in entries],
+                                   [entry.get('duration') for _, entry in entries])
+
+        for position, entry in entries:
+            if self.stopped:
+                return False
+            self.download_entry(entry, position)
+        return not self.stopped
+
+    def planned_entries(self):
+        # Après un redémarrage, les entrées restantes sont relues du journal : ni nouvelle
+        # extraction de la playlist, ni nouvelle vérification des entrées déjà terminées
+        if self.journal_id is None:
+            return list(enumerate(self.extract()))
+        journal = get_job_journal()
+        pending = journal.pending_entries(self.journal_id)
+        if pending is not None:
+            self.emit_message(f"Reprise : {len(pending)} entrée(s) restante(s)")
+            return pending
+        entries = self.extract()
+        journal.set_entries(self.journal_id, entries, self.url)
+        return list(enumerate(entries))
+
+    @property
+    def stopped(self):
+        return self.cancel_token.cancelled
+
+    def wait(self, seconds):
+        return not self.cancel_token.wait(seconds)
+
+    def on_retry(self, attempt, delay):
+        self.emit_message(f"Trop de requêtes. Tentative {attempt} dans {int(delay)} secondes...")
+
+    def wait_while_paused(self):
+        # Attente sans consommer de CPU ; renvoie la durée de la pause
+        if not self.paused:
+            return 0
+        paused_at = time.monotonic()
+        self._resume_event.wait()
+        self.aggregate.restart_sampling()
+        return time.monotonic() - paused_at
+
+    def download_entry(self, entry, position=None):
+        # En cas de 429, seule l'entrée en échec est reprise (les fichiers .part sont continués)
+        target = entry.get('webpage_url') or entry.get('url') or self.url
+        while True:
+            if self.wait_while_paused() > INFO_REUSE_MAX_AGE and entry.get('webpage_url'):
+                # Les URL des formats ont probablement expiré pendant la pause
+                entry = {'_type': 'url', 'url': entry['webpage_url'], 'ie_key': entry.get('extractor_key')}
+            if self.stopped:
+                self.discard_partial_files()
+                return
+            try:
+                retry_call(lambda: self.ydl.process_ie_result(entry, download=True),
+                           target, self.wait, self.on_retry, on_attempt=self.set_confirm_trial)
+                break
+            except (RetryAbort, DownloadCancelled):
+                self.discard_partial_files()
+                return
+            except DownloadPaused:
+                # La connexion est fermée ; la reprise repart du fichier .part avec une requête Range
+                continue
+        self.partial_files.clear()
+        if self.journal_id is not None and position is not None:
+            get_job_journal().mark_entry(self.journal_id, position)
+        self.aggregate.finish_entry(self.current_video)
+        self.current_video += 1
+        self.emit_progress(force=True)
+
+    def set_confirm_trial(self, confirm):
+        self.confirm_trial = confirm
+
+    def emit_progress(self, force=False):
+        # Émission limitée à 10 Hz pour ne pas saturer la boucle d'événements ; l'agrégat n'est
+        # calculé qu'au moment d'émettre, pas à chaque bloc lu
+        if self.on_progress and self.throttle.ready(force):
+            self.update_aggregate()
+            self.on_progress(self.current_progress, self.speed, self.eta, self.remaining)
+
+    def update_aggregate(self):
+        self.current_progress = self.aggregate.fraction() * 100
+        self.speed = self.aggregate.rate or self.aggregate.average_rate()
+        self.eta = self.aggregate.eta()
+        self.remaining = self.aggregate.remaining_bytes()
+
+    def emit_message(self, message):
+        if self.on_message:
+            self.on_message(message)
+
+    def progress_hook(self, d):
+        if d['status'] not in ('downloading', 'finished'):
+            return
+        if d.get('tmpfilename'):
+            self.partial_files.add(d['tmpfilename'])
+        if d['status'] == 'finished' and is_format_file(d):
+            # Format déjà complet d'une fusion inachevée : à supprimer aussi en cas d'arrêt
+            self.partial_files.add(d['filename'])
+        if self.cancel_token.cancelled:
+            raise DownloadCancelled()
+        if d['status'] == 'downloading' and self.paused and not transfer_complete(d):
+            # Interrompt le transfert en cours au lieu de garder le socket ouvert ; un fichier
+            # déjà complet se termine (une reprise à Range: bytes=<taille>- recevrait un 416)
+            raise DownloadPaused()
+        if d['status'] == 'downloading':
+            if self.confirm_trial:
+                # Premiers octets reçus : l'hôte répond de nouveau, les autres workers repartent
+                self.confirm_trial()
+                self.confirm_trial = None
+            if not d.get('bandwidth_limited'):
+                self.draw_bandwidth(d)
+
+        self.aggregate.update(self.current_video, d.get('tmpfilename') or d.get('filename'),
+                              d.get('downloaded_bytes') or 0,
+                              d.get('total_bytes') or d.get('total_bytes_estimate'))
+        self.emit_progress()
+
+    def draw_bandwidth(self, d):
+        # yt-dlp appelle le hook après chaque bloc lu : attendre ici freine la lecture du socket
+        filename = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        previous = self._drawn_bytes.get(filename)
+        self._drawn_bytes[filename] = downloaded
+        # Le premier rapport inclut les octets repris du .part : il ne tire rien
+        if previous is not None and downloaded > previous:
+            if not self.bandwidth.consume(downloaded - previous, self.wait_for_bandwidth):
+                if self.cancel_token.cancelled:
+                    raise DownloadCancelled()
+                if not transfer_complete(d):
+                    raise DownloadPaused()
+
+    def wait_for_bandwidth(self, seconds):
+        # Interrompue par une pause comme par un arrêt : le socket est fermé sans attendre les jetons
+        return not self._interrupt.wait(seconds)
+
+    def pause(self):
+        self.paused = True
+        self._resume_event.clear()
+        self._interrupt.set()
+
+    def resume(self):
+        self.paused = False
+        if not self.cancel_token.cancelled:
+            self._interrupt.clear()
+        self._resume_event.set()
+
+    def stop(self):
+        # Ne bloque jamais : le thread de téléchargement s'arrête au prochain bloc lu
+        self.cancel_token.cancel()
+        self._interrupt.set()
+        self._resume_event.set()
+
+    def file_ready(self, filepath):
+        # Appelé par yt-dlp une fois le fichier final écrit (après post-traitement)
+        if self.on_file_ready:
+            try:
+                self.on_file_ready(filepath, self.cancel_token)
+            except Cancelled:
+                pass
+
+    def discard_partial_files(self):
+        if self.keep_partial:
+            return
+        for filename in self.partial_files:
+            for path in (filename, filename + '.ytdl', filename + '.ranges', filename + '.frags'):
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    logging.error(f"Error in DownloadEngine: {str(e)}")
+        self.partial_files.clear()
@@ -0,0 +1,20 @@
+# Sélecteurs de formats partagés par l'interface, la ligne de commande et le moteur ;
+# module sans dépendance pour ne pas charger yt-dlp au démarrage
+
+# Pour chaque codec demandé, on privilégie un flux audio déjà dans ce codec :
+# FFmpegExtractAudio se contente alors d'une copie de flux au lieu d'un réencodage
+AUDIO_FORMATS = {
+    'best': 'bestaudio/best',
+    'm4a': 'bestaudio[acodec^=mp4a]/bestaudio[ext=m4a]/bestaudio/best',
+    'opus': 'bestaudio[acodec=opus]/bestaudio/best',
+    'mp3': 'bestaudio[acodec=mp3]/bestaudio/best',
+}
+AUDIO_CODECS = ['mp3', 'm4a', 'opus', 'best']
+
+
+def video_format(quality):
+    # « 720p » n'est pas un sélecteur yt-dlp : on le traduit en limite de hauteur
+    if quality and quality.endswith('p') and quality[:-1].isdigit():
+        height = quality[:-1]
+        return f'bestvideo[height<={height}]+bestaudio/best[height<={height}]'
+    return quality or 'best'
@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+import time
+import concurrent.futures
+from urllib.parse import urljoin
+import requests
+from yt_dlp.downloader.common import FileDownloader
+from http_pool import YoutubeDLSession, supports_params
+
+FRAGMENT_RETRIES = 5
+CHUNK_SIZE = 256 * 1024
+WINDOW_FACTOR = 2  # Fragments en vol ou en attente d'écriture, par connexion
+TICK_INTERVAL = 0.25
+
+
+class UnsupportedStream(Exception):
+    pass
+
+
+def dash_fragments(info):
+    base_url = info.get('fragment_base_url')
+    urls = []
+    for fragment in info['fragments']:
+        url = fragment.get('url') or urljoin(base_url, fragment['path'])
+        urls.append(url)
+    return urls
+
+
+def hls_fragments(session, info):
+    # Seules les listes simples sont prises en charge : le chiffrement et les sous-plages
+    # sont laissés au téléchargeur HLS de yt-dlp
+    response = session.get(info['url'], headers=info.get('http_headers') or {}, timeout=20)
+    response.raise_for_status()
+    manifest_url = response.url
+    urls = []
+    for line in response.text.splitlines():
+        line = line.strip()
+        if line.startswith(('#EXT-X-KEY', '#EXT-X-BYTERANGE')) and 'METHOD=NONE' not in line:
+            raise UnsupportedStream()
+        if line.startswith('#EXT-X-MAP'):
+            uri = line.split('URI="', 1)[1].split('"', 1)[0]
+            if 'BYTERANGE' in line:
+                raise UnsupportedStream()
+            urls.append(urljoin(manifest_url, uri))
+        elif line and not line.startswith('#'):
+            urls.append(urljoin(manifest_url, line))
+    if not urls:
+        raise UnsupportedStream()
+    return urls
+
+
+class OrderedFragmentWriter:
+    # N connexions récupèrent les fragments ; l'écriture se fait dans l'ordre et au plus
+    # `window` fragments sont en vol ou en mémoire, quelle que soit la longueur du flux
+    def __init__(self, session, urls, part_path, headers=None, connections=4, window=None, bandwidth=None):
+        self.session = session
+        self.urls = urls
+        self.part_path = part_path
+        self.state_path = part_path + '.frags'
+        self.headers = headers or {}
+        self.connections = connections
+        self.window = max(window or connections * WINDOW_FACTOR, connections)
+        self.next_index = 0
+        self.bytes_written = 0
+        self.buffered = {}
+        self.bandwidth = bandwidth
+        self._stop = threading.Event()
+
+    def prepare(self):
+        if os.path.exists(self.state_path) and os.path.exists(self.part_path):
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('count') == len(self.urls):
+                self.next_index = state['index']
+                self.bytes_written = state['bytes']
+                return
+        self.next_index = 0
+        self.bytes_written = 0
+
+    def save_state(self):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'count': len(self.urls), 'index': self.next_index, 'bytes': self.bytes_written}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def keep_going(self, seconds):
+        return not self._stop.wait(seconds)
+
+    def fetch(self, index):
+        attempt = 0
+        while True:
+            try:
+                with self.session.get(self.urls[index], headers=self.headers, stream=True, timeout=20) as response:
+                    response.raise_for_status()
+                    chunks = []
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        chunks.append(chunk)
+                        if self.bandwidth and not self.bandwidth.consume(len(chunk), self.keep_going):
+                            return None
+                    return b''.join(chunks)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                attempt += 1
+                if attempt > FRAGMENT_RETRIES:
+                    raise
+                if not self.keep_going(min(2 ** attempt, 30)):
+                    return None
+
+    def downloaded_bytes(self):
+        return self.bytes_written + sum(len(data) for data in self.buffered.values())
+
+    def estimated_total(self):
+        # Estimation d'après la taille moyenne des fragments déjà reçus
+        received = self.next_index + len(self.buffered)
+        if not received:
+            return None
+        return int(self.downloaded_bytes() / received * len(self.urls))
+
+    def run(self, on_tick=None):
+        # on_tick est appelé depuis ce thread-ci et peut lever une exception (pause, annulation) ;
+        # les fragments déjà écrits sont conservés et la reprise repart du suivant
+        self.prepare()
+        count = len(self.urls)
+        next_submit = self.next_index
+        pending = {}
+        with open(self.part_path, 'r+b' if self.bytes_written else 'wb') as out:
+            out.truncate(self.bytes_written)
+            out.seek(self.bytes_written)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.connections) as executor:
+                try:
+                    while self.next_index < count:
+                        while next_submit < count and next_submit - self.next_index < self.window:
+                            pending[executor.submit(self.fetch, next_submit)] = next_submit
+                            next_submit += 1
+                        done, _ = concurrent.futures.wait(pending, timeout=TICK_INTERVAL,
+                                                          return_when=concurrent.futures.FIRST_COMPLETED)
+                        for future in done:
+                            self.buffered[pending.pop(future)] = future.result()
+                        written = False
+                        while self.next_index in self.buffered:
+                            data = self.buffered.pop(self.next_index)
+                            out.write(data)
+                            self.bytes_written += len(data)
+                            self.next_index += 1
+                            written = True
+                        if written:
+                            out.flush()
+                            self.save_state()
+                        if on_tick:
+                            on_tick(self.next_index, count)
+                finally:
+                    self._stop.set()
+                    for future in pending:
+                        future.cancel()
+        os.remove(self.state_path)
+
+
+def is_fragmented(info, params):
+    if params.get('fragment_connections', 1) <= 1 or info.get('is_live') or not supports_params(params):
+        return False
+    if info.get('protocol') == 'http_dash_segments':
+        return bool(info.get('fragments'))
+    return info.get('protocol') == 'm3u8_native'
+
+
+class FragmentPipelineFD(FileDownloader):
+    def real_download(self, filename, info_dict):
+        connections = self.params.get('fragment_connections', 1)
+        session = YoutubeDLSession(self.ydl)
+        headers = info_dict.get('http_headers') or {}
+        try:
+            if info_dict['protocol'] == 'm3u8_native':
+                urls = hls_fragments(session, info_dict)
+            else:
+                urls = dash_fragments(info_dict)
+        except UnsupportedStream:
+            return self.fallback(filename, info_dict)
+
+        tmpfilename = self.temp_name(filename)
+        started = time.time()
+        writer = OrderedFragmentWriter(session, urls, tmpfilename, headers, connections,
+                                       bandwidth=self.params.get('bandwidth'))
+
+        def on_tick(index, count):
+            elapsed = time.time() - started
+            downloaded = writer.downloaded_bytes()
+            speed = downloaded / elapsed if elapsed else None
+            total = writer.estimated_total()
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes_estimate': total,
+                'filename': filename,
+                'tmpfilename': tmpfilename,
+                'bandwidth_limited': True,
+                'fragment_index': index,
+                'fragment_count': count,
+                'elapsed': elapsed,
+                'speed': speed,
+                'eta': (total - downloaded) / speed if speed and total else None,
+            }, info_dict)
+
+        writer.run(on_tick)
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            'status': 'finished',
+            'downloaded_bytes': writer.bytes_written,
+            'total_bytes': writer.bytes_written,
+            'filename': filename,
+            'elapsed': time.time() - started,
+        }, info_dict)
+        return True
+
+    def fallback(self, filename, info_dict):
+        # Téléchargeur de fragments de yt-dlp, lui aussi parallélisé (concurrent_fragment_downloads)
+        from yt_dlp.downloader import get_suitable_downloader
+        fd = get_suitable_downloader(info_dict, self.params)(self.ydl, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        return fd.real_download(filename, info_dict)
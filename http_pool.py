@@ -0,0 +1,44 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# Assez de connexions par hôte pour les téléchargements par plages et par fragments
+POOL_MAXSIZE = 32
+POOL_HOSTS = 16
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    # Session partagée par tout le processus : connexions persistantes (keep-alive) et
+    # poignées de main TLS réutilisées entre aperçus, mises à jour et téléchargements
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def supports_params(params):
+    # Réglages réseau de yt-dlp que requests ne reproduit pas : ces téléchargements restent à yt-dlp
+    proxy = params.get('proxy') or ''
+    return not (params.get('source_address') or params.get('impersonate') or proxy.startswith('socks'))
+
+
+class YoutubeDLSession:
+    # Session partagée, mais avec les cookies, le proxy et la vérification TLS de l'instance
+    # YoutubeDL : un CDN lié aux cookies ou joignable via le proxy répond comme à yt-dlp
+    def __init__(self, ydl):
+        self.cookiejar = ydl.cookiejar
+        proxy = ydl.params.get('proxy')
+        # Proxy vide : connexion directe, comme yt-dlp
+        self.proxies = None if proxy is None else {'http': proxy, 'https': proxy}
+        self.verify = not ydl.params.get('nocheckcertificate')
+
+    def get(self, url, **kwargs):
+        return get_session().get(url, cookies=self.cookiejar, proxies=self.proxies, verify=self.verify, **kwargs)
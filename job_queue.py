@@ -0,0 +1,98 @@
+import itertools
+import threading
+
+QUEUED = 'queued'
+RUNNING = 'running'
+PAUSED = 'paused'
+FINISHED = 'finished'
+STOPPED = 'stopped'
+FAILED = 'failed'
+
+ACTIVE_STATES = (RUNNING, PAUSED)
+DONE_STATES = (FINISHED, STOPPED, FAILED)
+
+_job_ids = itertools.count(1)
+
+
+class DownloadJob:
+    def __init__(self, url, save_path, quality, is_playlist, extract_audio=False, keep_partial=True,
+                 convert_format=None, audio_codec='mp3', connections=1,
+                 fragment_connections=1, use_archive=False):
+        self.job_id = next(_job_ids)
+        self.url = url
+        self.save_path = save_path
+        self.quality = quality
+        self.is_playlist = is_playlist
+        self.extract_audio = extract_audio
+        self.audio_codec = audio_codec
+        self.keep_partial = keep_partial
+        self.convert_format = convert_format
+        self.connections = connections
+        self.fragment_connections = fragment_connections
+        self.use_archive = use_archive
+        self.title = url
+        self.state = QUEUED
+        self.progress = 0.0
+        self.speed = None
+        self.eta = None
+        self.remaining = None
+        self.error = None
+        self.journal_id = None
+
+
+class JobQueue:
+    def __init__(self, max_concurrent=1):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.jobs = []  # L'ordre de la liste fait office de priorité
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        with self._lock:
+            self.jobs.append(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self.jobs:
+                if job.job_id == job_id:
+                    return job
+        return None
+
+    def move(self, job_id, offset):
+        with self._lock:
+            for index, job in enumerate(self.jobs):
+                if job.job_id == job_id:
+                    new_index = min(max(index + offset, 0), len(self.jobs) - 1)
+                    self.jobs.insert(new_index, self.jobs.pop(index))
+                    return new_index
+        return None
+
+    def clear_done(self):
+        with self._lock:
+            self.jobs = [job for job in self.jobs if job.state not in DONE_STATES]
+
+    def take_runnable(self):
+        # Renvoie les travaux à démarrer pour remplir les emplacements libres ;
+        # un travail en pause ne garde pas d'emplacement
+        with self._lock:
+            free_slots = self.max_concurrent - sum(1 for job in self.jobs if job.state == RUNNING)
+            runnable = []
+            for job in self.jobs:
+                if free_slots <= 0:
+                    break
+                if job.state == QUEUED:
+                    job.state = RUNNING
+                    runnable.append(job)
+                    free_slots -= 1
+            return runnable
+
+    def set_state(self, job_id, state, error=None):
+        job = self.get(job_id)
+        if job:
+            job.state = state
+            job.error = error
+        return job
+
+    def is_idle(self):
+        with self._lock:
+            return all(job.state in DONE_STATES for job in self.jobs)
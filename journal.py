@@ -0,0 +1,114 @@
+import json
+import sqlite3
+import threading
+import time
+from app_paths import data_path
+from job_queue import DownloadJob, QUEUED, PAUSED
+
+PENDING = 'pending'
+DONE = 'done'
+
+# Options d'un travail nécessaires pour le recréer à l'identique au redémarrage
+JOB_FIELDS = ('url', 'save_path', 'quality', 'is_playlist', 'extract_audio', 'keep_partial', 'convert_format',
+              'audio_codec', 'connections', 'fragment_connections', 'use_archive')
+
+
+def entry_ref(entry, fallback_url):
+    # Référence compacte : les URL des formats expirent, l'entrée est re-résolue à la reprise
+    return {
+        '_type': 'url',
+        'url': entry.get('webpage_url') or entry.get('url') or fallback_url,
+        'ie_key': entry.get('extractor_key') or entry.get('ie_key'),
+        'id': entry.get('id'),
+        'title': entry.get('title'),
+        # Pondération de la progression tant que la taille n'est pas connue
+        'duration': entry.get('duration'),
+    }
+
+
+class JobJournal:
+    # Journal durable des travaux non terminés et de l'état de chacune de leurs entrées ;
+    # chaque changement est validé immédiatement, un arrêt brutal ne perd rien
+    def __init__(self, path=None):
+        self.path = path or data_path('job_journal.sqlite3')
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                options TEXT NOT NULL,
+                                title TEXT,
+                                state TEXT NOT NULL,
+                                updated REAL NOT NULL)""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                                job_id INTEGER NOT NULL,
+                                position INTEGER NOT NULL,
+                                ref TEXT NOT NULL,
+                                status TEXT NOT NULL,
+                                PRIMARY KEY (job_id, position))""")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def add_job(self, job):
+        options = json.dumps({field: getattr(job, field) for field in JOB_FIELDS})
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute("INSERT INTO jobs (options, title, state, updated) VALUES (?, ?, ?, ?)",
+                                  (options, job.title, job.state, time.time()))
+            return cursor.lastrowid
+
+    def set_state(self, journal_id, state):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE jobs SET state = ?, updated = ? WHERE id = ?", (state, time.time(), journal_id))
+
+    def remove_job(self, journal_id):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE job_id = ?", (journal_id,))
+            conn.execute("DELETE FROM jobs WHERE id = ?", (journal_id,))
+
+    def set_entries(self, journal_id, entries, fallback_url):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE job_id = ?", (journal_id,))
+            conn.executemany("INSERT INTO entries (job_id, position, ref, status) VALUES (?, ?, ?, ?)",
+                             [(journal_id, position, json.dumps(entry_ref(entry, fallback_url)), PENDING)
+                              for position, entry in enumerate(entries)])
+
+    def pending_entries(self, journal_id):
+        # None si les entrées n'ont jamais été résolues : le travail doit encore être extrait
+        with self._lock, self._connect() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM entries WHERE job_id = ?", (journal_id,)).fetchone()[0]
+            rows = conn.execute("SELECT position, ref FROM entries WHERE job_id = ? AND status = ? "
+                                "ORDER BY position", (journal_id, PENDING)).fetchall()
+        if not total:
+            return None
+        return [(position, json.loads(ref)) for position, ref in rows]
+
+    def mark_entry(self, journal_id, position, status=DONE):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE entries SET status = ? WHERE job_id = ? AND position = ?",
+                         (status, journal_id, position))
+
+    def unfinished_jobs(self):
+        # Travaux à rejouer au démarrage ; un travail en cours lors de l'arrêt repart en file d'attente
+        with self._lock, self._connect() as conn:
+            rows = conn.execute("SELECT id, options, title, state FROM jobs ORDER BY id").fetchall()
+        jobs = []
+        for journal_id, options, title, state in rows:
+            job = DownloadJob(**json.loads(options))
+            job.journal_id = journal_id
+            job.title = title or job.url
+            job.state = PAUSED if state == PAUSED else QUEUED
+            jobs.append(job)
+        return jobs
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_job_journal():
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = JobJournal()
+        return _journal
@@ -0,0 +1,132 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from app_paths import data_path
+
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Les URL des formats expirent : le téléchargement ne réutilise que des infos récentes
+INFO_REUSE_MAX_AGE = 30 * 60
+
+# Champs volumineux inutiles pour l'aperçu comme pour le téléchargement
+_DROPPED_FIELDS = ('automatic_captions', 'heatmap')
+
+
+def canonical_key(url):
+    import yt_dlp.extractor
+
+    url = url.strip()
+    for ie in yt_dlp.extractor.gen_extractor_classes():
+        if ie.ie_key() == 'Generic':
+            continue
+        if ie.suitable(url):
+            temp_id = ie.get_temp_id(url)
+            if temp_id:
+                return f"{ie.ie_key()}:{temp_id}"
+            break
+    return url
+
+
+def info_key(info):
+    if info.get('extractor_key') and info.get('id'):
+        return f"{info['extractor_key']}:{info['id']}"
+    return None
+
+
+class MetadataCache:
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or data_path('metadata_cache.sqlite3')
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS metadata (
+                                key TEXT PRIMARY KEY,
+                                record BLOB NOT NULL,
+                                thumbnail BLOB,
+                                size INTEGER NOT NULL,
+                                created REAL NOT NULL,
+                                accessed REAL NOT NULL)""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS aliases (
+                                url TEXT PRIMARY KEY,
+                                key TEXT NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _resolve_key(self, conn, url):
+        row = conn.execute("SELECT key FROM aliases WHERE url = ?", (url.strip(),)).fetchone()
+        if row:
+            return row[0]
+        return canonical_key(url)
+
+    def get(self, url, max_age=None):
+        max_age = self.ttl if max_age is None else min(max_age, self.ttl)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            key = self._resolve_key(conn, url)
+            row = conn.execute("SELECT record, thumbnail, created FROM metadata WHERE key = ?",
+                               (key,)).fetchone()
+            if row is None:
+                return None
+            record, thumbnail, created = row
+            if now - created > max_age:
+                if now - created > self.ttl:
+                    conn.execute("DELETE FROM metadata WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE metadata SET accessed = ? WHERE key = ?", (now, key))
+        record = json.loads(zlib.decompress(record))
+        record['thumbnail'] = thumbnail
+        return record
+
+    def get_info(self, url, max_age=INFO_REUSE_MAX_AGE):
+        record = self.get(url, max_age=max_age)
+        if record:
+            return record.get('info')
+        return None
+
+    def put(self, url, key, record):
+        record = dict(record)
+        thumbnail = record.pop('thumbnail', None)
+        if record.get('info'):
+            record['info'] = {k: v for k, v in record['info'].items() if k not in _DROPPED_FIELDS}
+        blob = zlib.compress(json.dumps(record).encode('utf-8'))
+        size = len(blob) + len(thumbnail or b'')
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO metadata (key, record, thumbnail, size, created, accessed) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (key, blob, thumbnail, size, now, now))
+            conn.execute("INSERT OR REPLACE INTO aliases (url, key) VALUES (?, ?)", (url.strip(), key))
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM metadata WHERE created < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM metadata").fetchone()[0]
+        if total > self.max_bytes:
+            # Éviction LRU : les entrées les moins récemment consultées partent d'abord
+            for key, size in conn.execute("SELECT key, size FROM metadata ORDER BY accessed").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM metadata WHERE key = ?", (key,))
+                total -= size
+        conn.execute("DELETE FROM aliases WHERE key NOT IN (SELECT key FROM metadata)")
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM metadata")
+            conn.execute("DELETE FROM aliases")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_metadata_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetadataCache()
+        return _cache
@@ -0,0 +1,75 @@
+import logging
+import queue
+import threading
+from cancel import Cancelled, CancelToken
+from conversion import convert_file, output_path, DEFAULT_PRESET
+
+DEFAULT_QUEUE_SIZE = 2
+
+
+class ConversionPipeline:
+    # Étape de conversion alimentée par les téléchargements terminés ; la file bornée
+    # bloque les téléchargements quand les conversions prennent du retard
+    def __init__(self, workers=1, queue_size=DEFAULT_QUEUE_SIZE, threads=0, preset=DEFAULT_PRESET, on_status=None):
+        self.workers = workers
+        self.threads = threads
+        self.preset = preset
+        self.on_status = on_status
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.cancel_token = CancelToken()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"conversion-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def emit_status(self, input_file, status, message=""):
+        if self.on_status:
+            self.on_status(input_file, status, message)
+
+    def submit(self, input_file, target_format, cancel_token=None):
+        # Appelé depuis le thread de téléchargement : attend une place libre dans la file
+        self.emit_status(input_file, 'queued')
+        while True:
+            if cancel_token and cancel_token.cancelled:
+                raise Cancelled()
+            try:
+                self.queue.put((input_file, target_format), timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                input_file, target_format = item
+                if self.cancel_token.cancelled:
+                    self.emit_status(input_file, 'cancelled')
+                    continue
+                output_file = output_path(input_file, None, target_format)
+                self.emit_status(input_file, 'running')
+                try:
+                    convert_file(input_file, output_file, target_format, self.threads, self.preset,
+                                 cancel_token=self.cancel_token)
+                    self.emit_status(input_file, 'done', output_file)
+                except Cancelled:
+                    self.emit_status(input_file, 'cancelled')
+                except Exception as e:
+                    logging.error(f"Error in ConversionPipeline: {str(e)}")
+                    self.emit_status(input_file, 'failed', str(e))
+            finally:
+                self.queue.task_done()
+
+    def close(self, cancel=False):
+        if cancel:
+            self.cancel_token.cancel()
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
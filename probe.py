@@ -0,0 +1,106 @@
+import itertools
+import logging
+from http_pool import get_session
+from metadata_cache import get_metadata_cache, info_key, canonical_key
+from ydl_pool import get_ydl_pool
+
+
+def list_qualities(video_info):
+    available_qualities = ['best']
+    for format in video_info.get('formats') or []:
+        if 'height' in format and format['height']:
+            quality = f"{format['height']}p"
+            if quality not in available_qualities:
+                available_qualities.append(quality)
+
+    return sorted(available_qualities, key=lambda x: int(x[:-1]) if x != 'best' else float('inf'), reverse=True)
+
+
+def first_entry(entries):
+    if entries is None:
+        return None
+    if hasattr(entries, 'getslice'):
+        first = entries.getslice(0, 1)
+    else:
+        first = list(itertools.islice(entries, 1))
+    return first[0] if first else None
+
+
+def count_entries(info):
+    if info.get('playlist_count'):
+        return info['playlist_count']
+    if isinstance(info.get('entries'), list):
+        return len(info['entries'])
+    return None
+
+
+def extract_lazy(ydl, url, ie_key=None):
+    # Extraction sans traitement : les entrées d'une playlist restent paresseuses
+    info = ydl.extract_info(url, download=False, process=False, ie_key=ie_key)
+    while info.get('_type') in ('url', 'url_transparent'):
+        info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+    return info
+
+
+def first_video(ydl, info):
+    # Seule la première vidéo est extraite, le reste attend le téléchargement
+    while info.get('_type') in ('playlist', 'multi_video'):
+        entry = first_entry(info.get('entries'))
+        if entry is None:
+            raise ValueError("La playlist est vide")
+        if entry.get('_type') in ('url', 'url_transparent'):
+            entry = extract_lazy(ydl, entry['url'], entry.get('ie_key'))
+        info = entry
+    return info
+
+
+def extract_preview(url, cancel_token=None):
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+    }
+    with get_ydl_pool().acquire(ydl_opts) as ydl:
+        info = extract_lazy(ydl, url)
+        is_playlist = info.get('_type') in ('playlist', 'multi_video')
+        video = first_video(ydl, info)
+        # Copie prise avant la sélection de formats de l'aperçu : DownloadEngine refait la sienne
+        # (qualité, extraction audio) au lieu d'hériter de requested_formats
+        raw_info = None if is_playlist else ydl.sanitize_info(video, remove_private_keys=True)
+        video_info = ydl.process_ie_result(video, download=False)
+
+        record = {
+            'title': video_info['title'],
+            'qualities': list_qualities(video_info),
+            'is_playlist': is_playlist,
+            'entry_count': count_entries(info) if is_playlist else 1,
+            # Seules les vidéos simples sont réutilisables par DownloadEngine
+            'info': raw_info,
+        }
+
+    if cancel_token:
+        cancel_token.raise_if_cancelled()
+    response = get_session().get(video_info['thumbnail'], timeout=20)
+    response.raise_for_status()
+    record['thumbnail'] = response.content
+    return info_key(info) or canonical_key(url), record
+
+
+def probe_url(url, use_cache=True, cancel_token=None):
+    cache = get_metadata_cache() if use_cache else None
+    if cache:
+        try:
+            record = cache.get(url)
+            if record:
+                return record
+        except Exception as e:
+            logging.error(f"Error in MetadataCache: {str(e)}")
+
+    if cancel_token:
+        cancel_token.raise_if_cancelled()
+    key, record = extract_preview(url, cancel_token)
+    if cache:
+        try:
+            cache.put(url, key, record)
+        except Exception as e:
+            logging.error(f"Error in MetadataCache: {str(e)}")
+    return record
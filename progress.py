@@ -0,0 +1,223 @@
+import time
+
+DEFAULT_EMIT_INTERVAL = 0.1  # 10 Hz
+
+
+class ProgressThrottle:
+    def __init__(self, interval=DEFAULT_EMIT_INTERVAL, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self._last_emit = None
+
+    def ready(self, force=False):
+        now = self.clock()
+        if force or self._last_emit is None or now - self._last_emit >= self.interval:
+            self._last_emit = now
+            return True
+        return False
+
+
+def expected_bytes(info):
+    formats = info.get('requested_formats') or [info]
+    total = 0
+    for format in formats:
+        size = format.get('filesize') or format.get('filesize_approx')
+        if not size:
+            return None
+        total += size
+    return total
+
+
+class ByteProgress:
+    # Progression agrégée d'un travail, pondérée par la taille attendue de chaque entrée ; une
+    # entrée sans taille (entrée « plate » de playlist) est estimée d'après sa durée et le débit
+    # binaire mesuré. Les sommes sont tenues à jour : le calcul ne dépend pas du nombre d'entrées
+    def __init__(self, clock=time.monotonic, smoothing=0.3, sample_interval=0.5):
+        self.clock = clock
+        self.smoothing = smoothing
+        self.sample_interval = sample_interval
+        self.current_index = None
+        self.current_files = {}
+        self.started = None
+        self.transferred = 0
+        self.rate = None
+        self._last_seen = {}
+        self._sample_time = None
+        self._sample_bytes = 0
+        self.set_entries([])
+
+    def set_entries(self, sizes, durations=None):
+        self.expected = list(sizes)
+        self.durations = list(durations) if durations else [None] * len(self.expected)
+        self.completed = {}
+        self.completed_bytes = 0
+        known = [size for size in self.expected if size]
+        self.known_sum = sum(known)
+        self.known_count = len(known)
+        # Entrées non terminées, par mode d'estimation
+        self.open_known = self.known_sum
+        self.open_timed = sum(duration for size, duration in zip(self.expected, self.durations)
+                              if not size and duration)
+        self.open_timed_count = sum(1 for size, duration in zip(self.expected, self.durations)
+                                    if not size and duration)
+        self.open_untimed = sum(1 for size, duration in zip(self.expected, self.durations)
+                                if not size and not duration)
+        # Octets et secondes de média des entrées terminées dont la durée est connue
+        self.measured_bytes = 0
+        self.measured_seconds = 0
+        self.max_fraction = 0.0
+
+    def _current_total(self):
+        return sum(total for _, total in self.current_files.values() if total)
+
+    def _current_open(self):
+        return self.current_index is not None and self.current_index < len(self.expected) \
+            and self.current_index not in self.completed
+
+    def _bitrate(self):
+        measured_bytes, measured_seconds = self.measured_bytes, self.measured_seconds
+        if self._current_open() and self.durations[self.current_index] and self._current_total():
+            measured_bytes += self._current_total()
+            measured_seconds += self.durations[self.current_index]
+        return measured_bytes / measured_seconds if measured_seconds else None
+
+    def _mean_size(self):
+        if self.known_count:
+            return self.known_sum / self.known_count
+        # Aucune taille annoncée : moyenne des entrées déjà mesurées
+        total, count = self.completed_bytes, len(self.completed)
+        if self._current_open() and self._current_total():
+            total += self._current_total()
+            count += 1
+        return total / count if count else 0
+
+    def _unknown_estimate(self, duration, bitrate, mean):
+        if duration and bitrate:
+            return duration * bitrate
+        return mean
+
+    def _estimate(self, index, bitrate=None, mean=None):
+        size = self.expected[index] if index < len(self.expected) else None
+        if index == self.current_index:
+            size = max(size or 0, self._current_total()) or size
+        if size:
+            return size
+        duration = self.durations[index] if index < len(self.durations) else None
+        return self._unknown_estimate(duration, self._bitrate() if bitrate is None else bitrate,
+                                      self._mean_size() if mean is None else mean)
+
+    def total_bytes(self):
+        bitrate = self._bitrate()
+        mean = self._mean_size()
+        timed = self.open_timed * bitrate if bitrate else self.open_timed_count * mean
+        total = self.completed_bytes + self.open_known + timed + self.open_untimed * mean
+        if self._current_open():
+            # L'entrée en cours compte pour sa taille réelle dès qu'elle est connue
+            index = self.current_index
+            base = self.expected[index] or self._unknown_estimate(self.durations[index], bitrate, mean)
+            total += self._estimate(index, bitrate, mean) - base
+        return total
+
+    def downloaded_bytes(self):
+        current = sum(downloaded for downloaded, _ in self.current_files.values())
+        return self.completed_bytes + current
+
+    def remaining_bytes(self):
+        return max(self.total_bytes() - self.downloaded_bytes(), 0)
+
+    def fraction(self):
+        total = self.total_bytes()
+        if not total:
+            value = len(self.completed) / len(self.expected) if self.expected else 0.0
+        else:
+            value = min(self.downloaded_bytes() / total, 1.0)
+        # Une estimation corrigée à la hausse ne fait jamais reculer la barre
+        self.max_fraction = max(self.max_fraction, value)
+        return self.max_fraction
+
+    def update(self, index, filename, downloaded, total):
+        now = self.clock()
+        if self.started is None:
+            self.started = now
+            self._sample_time = now
+        if index != self.current_index:
+            self.current_index = index
+            self.current_files = {}
+        self.current_files[filename] = (downloaded, total)
+
+        # Les octets déjà présents dans un fichier .part repris ne comptent pas dans le débit
+        last = self._last_seen.get(filename, downloaded)
+        self.transferred += max(downloaded - last, 0)
+        self._last_seen[filename] = downloaded
+
+        elapsed = now - self._sample_time
+        if elapsed >= self.sample_interval:
+            instant = (self.transferred - self._sample_bytes) / elapsed
+            self.rate = instant if self.rate is None else self.smoothing * instant + (1 - self.smoothing) * self.rate
+            self._sample_time = now
+            self._sample_bytes = self.transferred
+
+    def restart_sampling(self):
+        # Après une pause, le débit repart de zéro au lieu de moyenner le temps d'arrêt
+        self._sample_time = self.clock()
+        self._sample_bytes = self.transferred
+        self.rate = None
+
+    def finish_entry(self, index):
+        if index in self.completed or index >= len(self.expected):
+            return
+        downloaded = sum(downloaded for downloaded, _ in self.current_files.values()) if index == self.current_index else 0
+        size = downloaded or self._estimate(index)
+        self.completed[index] = size
+        self.completed_bytes += size
+        expected, duration = self.expected[index], self.durations[index]
+        if expected:
+            self.open_known -= expected
+        elif duration:
+            self.open_timed -= duration
+            self.open_timed_count -= 1
+        else:
+            self.open_untimed -= 1
+        if duration and downloaded:
+            self.measured_bytes += downloaded
+            self.measured_seconds += duration
+        if index == self.current_index:
+            self.current_index = None
+            self.current_files = {}
+
+    def average_rate(self):
+        if self.started is None:
+            return None
+        elapsed = self.clock() - self.started
+        return self.transferred / elapsed if elapsed > 0 else None
+
+    def eta(self):
+        rate = self.rate or self.average_rate()
+        if not rate:
+            return None
+        return self.remaining_bytes() / rate
+
+
+def format_size(size):
+    for unit in ("o", "Ko", "Mo", "Go"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} To"
+
+
+def format_speed(speed):
+    if not speed:
+        return "-"
+    return f"{format_size(speed)}/s"
+
+
+def format_eta(eta):
+    if eta is None or eta < 0:
+        return "--:--"
+    eta = int(eta)
+    hours, rest = divmod(eta, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
@@ -0,0 +1,150 @@
+import datetime
+import threading
+import time
+
+BURST_SECONDS = 0.5
+ACTIVE_WINDOW = 2.0  # Un travail qui n'a rien demandé depuis ce délai ne compte plus dans le partage
+MAX_WAIT_SLICE = 0.25  # Attente découpée : un changement de limite s'applique rapidement
+
+
+def parse_schedule(text):
+    # « 08:00-18:00=500; 22:00-07:00=0 » : limite totale en Kio/s par plage horaire (0 = illimité)
+    schedule = []
+    for rule in text.replace(',', ';').split(';'):
+        rule = rule.strip()
+        if not rule:
+            continue
+        try:
+            hours, rate = rule.split('=')
+            start, end = hours.split('-')
+            start = datetime.datetime.strptime(start.strip(), '%H:%M').time()
+            end = datetime.datetime.strptime(end.strip(), '%H:%M').time()
+            rate = int(rate) * 1024
+        except ValueError:
+            raise ValueError(f"Règle de planification invalide : {rule}")
+        schedule.append((start, end, rate))
+    return schedule
+
+
+def rule_matches(start, end, moment):
+    if start <= end:
+        return start <= moment < end
+    return moment >= start or moment < end  # Plage à cheval sur minuit
+
+
+class Bucket:
+    def __init__(self):
+        self.tokens = 0.0
+        self.updated = None
+
+    def refill(self, rate, now):
+        if self.updated is not None:
+            self.tokens = min(rate * BURST_SECONDS, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+
+class JobBandwidth:
+    # Part d'un travail dans le limiteur global ; consume() est appelé par chaque worker
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.bucket = Bucket()
+        self.last_seen = None
+
+    def consume(self, amount, wait=None):
+        # wait(seconds) doit renvoyer False si le travail a été arrêté pendant l'attente
+        while True:
+            delay = self.limiter.take(self, amount)
+            if delay <= 0:
+                return True
+            delay = min(delay, MAX_WAIT_SLICE)
+            if wait is None:
+                time.sleep(delay)
+            elif not wait(delay):
+                return False
+
+    def close(self):
+        self.limiter.unregister(self)
+
+
+class BandwidthLimiter:
+    # Seau à jetons global (limite totale) plus un seau par travail dont le débit est la part
+    # équitable de la limite totale, elle-même bornée par la limite par travail ; les jetons
+    # sont pris à crédit, seul le débit moyen compte
+    def __init__(self, total_rate=0, job_rate=0, schedule=None, clock=time.monotonic, now=datetime.datetime.now):
+        self.total_rate = total_rate
+        self.job_rate = job_rate
+        self.schedule = schedule or []
+        self.clock = clock
+        self.now = now
+        self.bucket = Bucket()
+        self.jobs = []
+        self._lock = threading.Lock()
+
+    def set_limits(self, total_rate, job_rate):
+        with self._lock:
+            self.total_rate = total_rate
+            self.job_rate = job_rate
+
+    def set_schedule(self, schedule):
+        with self._lock:
+            self.schedule = schedule
+
+    def register(self):
+        job = JobBandwidth(self)
+        with self._lock:
+            self.jobs.append(job)
+        return job
+
+    def unregister(self, job):
+        with self._lock:
+            if job in self.jobs:
+                self.jobs.remove(job)
+
+    def current_total_rate(self):
+        moment = self.now().time()
+        for start, end, rate in self.schedule:
+            if rule_matches(start, end, moment):
+                return rate
+        return self.total_rate
+
+    def take(self, job, amount):
+        # Renvoie le temps d'attente avant de réessayer (0 = jetons accordés)
+        with self._lock:
+            now = self.clock()
+            job.last_seen = now
+            total_rate = self.current_total_rate()
+            job_rate = self.job_rate
+            if total_rate:
+                active = sum(1 for other in self.jobs
+                             if other.last_seen is not None and now - other.last_seen < ACTIVE_WINDOW)
+                share = total_rate / max(active, 1)
+                job_rate = min(job_rate, share) if job_rate else share
+            if total_rate:
+                self.bucket.refill(total_rate, now)
+            if job_rate:
+                job.bucket.refill(job_rate, now)
+            delays = []
+            if total_rate and self.bucket.tokens < 0:
+                delays.append(-self.bucket.tokens / total_rate)
+            if job_rate and job.bucket.tokens < 0:
+                delays.append(-job.bucket.tokens / job_rate)
+            if delays:
+                return max(delays)
+            if total_rate:
+                self.bucket.tokens -= amount
+            if job_rate:
+                job.bucket.tokens -= amount
+            return 0.0
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_bandwidth_limiter():
+    # Limiteur partagé par tous les téléchargements du processus
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = BandwidthLimiter()
+        return _limiter
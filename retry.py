@@ -0,0 +1,169 @@
+import email.utils
+import itertools
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class RetryPolicy:
+    def __init__(self, base_delay=5.0, max_delay=600.0, max_attempts=8, jitter=0.5):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.jitter = jitter
+
+    def delay(self, attempt, retry_after=None):
+        backoff = min(self.max_delay, self.base_delay * 2 ** attempt)
+        # Gigue proportionnelle pour que les workers ne repartent pas tous ensemble
+        backoff = random.uniform(backoff * (1 - self.jitter), backoff)
+        if retry_after is not None:
+            return min(max(retry_after, 0), self.max_delay) + random.uniform(0, self.base_delay * self.jitter)
+        return backoff
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+def parse_retry_after(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(date.timestamp() - time.time(), 0)
+
+
+def find_http_error(exc):
+    # yt-dlp enveloppe l'erreur HTTP d'origine dans DownloadError / ExtractorError
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if getattr(exc, 'status', None) or getattr(exc, 'code', None):
+            return exc
+        exc_info = getattr(exc, 'exc_info', None)
+        if exc_info and exc_info[1] is not exc:
+            exc = exc_info[1]
+            continue
+        exc = getattr(exc, 'cause', None) or exc.__cause__ or exc.__context__
+    return None
+
+
+def is_throttled(exc):
+    http_error = find_http_error(exc)
+    status = http_error and (getattr(http_error, 'status', None) or getattr(http_error, 'code', None))
+    return status == 429 or "HTTP Error 429" in str(exc)
+
+
+def retry_after_from(exc):
+    http_error = find_http_error(exc)
+    if http_error is None:
+        return None
+    response = getattr(http_error, 'response', None)
+    headers = getattr(response, 'headers', None) or getattr(http_error, 'headers', None)
+    if not headers:
+        return None
+    return parse_retry_after(headers.get('Retry-After'))
+
+
+def host_of(url):
+    return (urlparse(url).hostname or url).lower()
+
+
+class CircuitBreaker:
+    def __init__(self, policy=DEFAULT_POLICY, clock=time.monotonic):
+        self.policy = policy
+        self.clock = clock
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial = None  # Jeton de l'essai semi-ouvert en cours
+        self._trials = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Renvoie (attente, jeton) : attente 0 = autorisé ; le jeton désigne l'essai semi-ouvert,
+        # None pour une requête ordinaire
+        with self._lock:
+            now = self.clock()
+            if now < self.open_until:
+                return self.open_until - now, None
+            if self.failures:
+                # Semi-ouvert : une seule requête d'essai à la fois
+                if self.trial is not None:
+                    return 1.0, None
+                self.trial = next(self._trials)
+                return 0.0, self.trial
+            return 0.0, None
+
+    def record_success(self, trial):
+        # Seul l'essai en cours referme le disjoncteur : une requête lancée avant l'ouverture
+        # ne remet pas le recul exponentiel à zéro
+        with self._lock:
+            if trial is not None and trial == self.trial:
+                self.failures = 0
+                self.trial = None
+
+    def record_failure(self, retry_after=None):
+        with self._lock:
+            delay = self.policy.delay(self.failures, retry_after)
+            self.failures += 1
+            self.trial = None
+            self.open_until = max(self.open_until, self.clock() + delay)
+            return delay
+
+    def release(self, trial):
+        with self._lock:
+            if trial is not None and trial == self.trial:
+                self.trial = None
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(url):
+    # Un disjoncteur par hôte, partagé par tous les workers du processus
+    host = host_of(url)
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+
+class RetryAbort(Exception):
+    pass
+
+
+def retry_call(func, url, wait, on_retry=None, policy=DEFAULT_POLICY, on_attempt=None):
+    # wait(seconds) doit renvoyer False si le travail a été arrêté pendant l'attente ;
+    # on_attempt(confirm) reçoit, avant chaque tentative, de quoi valider l'essai semi-ouvert
+    # dès la première réponse, sans attendre la fin d'un long téléchargement
+    breaker = get_breaker(url)
+    attempt = 0
+    while True:
+        delay, trial = breaker.acquire()
+        while delay > 0:
+            if not wait(delay):
+                raise RetryAbort()
+            delay, trial = breaker.acquire()
+        if on_attempt:
+            on_attempt(lambda trial=trial: breaker.record_success(trial))
+        try:
+            result = func()
+        except Exception as e:
+            if not is_throttled(e):
+                breaker.release(trial)
+                raise
+            attempt += 1
+            delay = breaker.record_failure(retry_after_from(e))
+            if attempt >= policy.max_attempts:
+                raise
+            if on_retry:
+                on_retry(attempt, delay)
+            continue
+        breaker.record_success(trial)
+        return result
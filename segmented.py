@@ -0,0 +1,247 @@
+import json
+import os
+import re
+import threading
+import time
+import concurrent.futures
+import requests
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.downloader.http import HttpFD
+from cancel import Cancelled
+from http_pool import YoutubeDLSession, supports_params
+
+MIN_SEGMENTED_SIZE = 16 * 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+RANGE_RETRIES = 5
+STATE_SAVE_INTERVAL = 1.0
+TICK_INTERVAL = 0.25
+
+
+class RangeNotSupported(Exception):
+    pass
+
+
+def probe_size(session, url, headers):
+    # Demande d'un seul octet : confirme le support des requêtes Range et donne la taille totale
+    response = session.get(url, headers=dict(headers or {}, Range='bytes=0-0'), stream=True, timeout=20)
+    try:
+        match = re.match(r'bytes 0-0/(\d+)', response.headers.get('Content-Range', ''))
+        if response.status_code != 206 or not match:
+            raise RangeNotSupported()
+        return int(match.group(1))
+    finally:
+        response.close()
+
+
+def read_state(state_path):
+    try:
+        with open(state_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def discard_range_state(part_path):
+    # Un .part accompagné de son annexe .ranges est préalloué à la taille finale : sa taille
+    # ne dit rien des octets reçus, aucun téléchargeur séquentiel ne doit le reprendre
+    state_path = part_path + '.ranges'
+    if not os.path.exists(state_path):
+        return
+    for path in (part_path, state_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class RangeDownload:
+    # Téléchargement d'un fichier en plusieurs plages d'octets, écrites en place dans un
+    # fichier préalloué ; l'avancement de chaque plage est conservé dans un fichier annexe
+    def __init__(self, session, url, part_path, size, headers=None, connections=4, cancel_token=None,
+                 bandwidth=None):
+        self.session = session
+        self.url = url
+        self.part_path = part_path
+        self.state_path = part_path + '.ranges'
+        self.size = size
+        self.headers = headers or {}
+        self.connections = connections
+        self.cancel_token = cancel_token
+        self.bandwidth = bandwidth
+        self.ranges = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._last_save = 0.0
+
+    def prepare(self):
+        if os.path.exists(self.state_path):
+            state = read_state(self.state_path)
+            if (state and os.path.exists(self.part_path) and state.get('size') == self.size
+                    and state.get('url_key') == self.url_key()):
+                self.ranges = [list(r) for r in state['ranges']]
+                return
+            # Annexe d'un autre fichier : le .part préalloué n'est que partiellement rempli
+            discard_range_state(self.part_path)
+
+        # Sans annexe, un .part hérité d'un téléchargement mono-connexion sert de préfixe déjà acquis
+        prefix = os.path.getsize(self.part_path) if os.path.exists(self.part_path) else 0
+        if prefix > self.size:
+            prefix = 0
+        with open(self.part_path, 'r+b' if prefix else 'wb') as f:
+            f.truncate(self.size)
+        span = self.size - prefix
+        step = max(span // self.connections, 1)
+        start = prefix
+        self.ranges = []
+        while start < self.size:
+            end = self.size - 1 if len(self.ranges) == self.connections - 1 else min(start + step, self.size) - 1
+            self.ranges.append([start, end, 0])
+            start = end + 1
+        if prefix:
+            self.ranges.insert(0, [0, prefix - 1, prefix])
+        self.save_state(force=True)
+
+    def url_key(self):
+        # Les URL signées changent à chaque extraction ; on ne compare que le chemin
+        return self.url.split('?', 1)[0]
+
+    def save_state(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_save < STATE_SAVE_INTERVAL:
+            return
+        self._last_save = now
+        with self._lock:
+            state = {'size': self.size, 'url_key': self.url_key(), 'ranges': [list(r) for r in self.ranges]}
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def downloaded_bytes(self):
+        with self._lock:
+            return sum(done for _, _, done in self.ranges)
+
+    def keep_going(self, seconds):
+        return not self._stop.wait(seconds)
+
+    def _fetch_range(self, index):
+        attempt = 0
+        # Sans tampon : l'état sauvegardé ne compte jamais d'octets restés en mémoire
+        with open(self.part_path, 'r+b', buffering=0) as f:
+            while True:
+                start, end, done = self.ranges[index]
+                if start + done > end:
+                    return
+                try:
+                    response = self.session.get(self.url, stream=True, timeout=20,
+                                                headers=dict(self.headers, Range=f'bytes={start + done}-{end}'))
+                    with response:
+                        if response.status_code != 206:
+                            raise RangeNotSupported()
+                        f.seek(start + done)
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            if self._stop.is_set():
+                                return
+                            f.write(chunk)
+                            with self._lock:
+                                self.ranges[index][2] += len(chunk)
+                            if self.bandwidth and not self.bandwidth.consume(len(chunk), self.keep_going):
+                                return
+                    attempt = 0
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                    attempt += 1
+                    if attempt > RANGE_RETRIES:
+                        raise
+                    if not self.keep_going(min(2 ** attempt, 30)):
+                        return
+
+    def run(self, on_tick=None):
+        # on_tick est appelé depuis ce thread-ci : il peut lever une exception (pause, annulation),
+        # les connexions sont alors fermées et l'état des plages sauvegardé pour la reprise
+        self.prepare()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.ranges)) as executor:
+            futures = [executor.submit(self._fetch_range, index) for index in range(len(self.ranges))]
+            try:
+                while True:
+                    finished, pending = concurrent.futures.wait(futures, timeout=TICK_INTERVAL)
+                    for future in finished:
+                        future.result()
+                    if self.cancel_token and self.cancel_token.cancelled:
+                        raise Cancelled()
+                    if on_tick:
+                        on_tick(self.downloaded_bytes())
+                    self.save_state()
+                    if not pending:
+                        break
+            finally:
+                self._stop.set()
+                self.save_state(force=True)
+
+        if self.downloaded_bytes() < self.size:
+            raise requests.ConnectionError("Téléchargement incomplet")
+        os.remove(self.state_path)
+
+
+def is_segmentable(info, params):
+    if params.get('segmented_connections', 1) <= 1:
+        return False
+    if info.get('protocol') not in ('http', 'https') or info.get('fragments') or not supports_params(params):
+        return False
+    size = info.get('filesize') or info.get('filesize_approx')
+    return not size or size >= MIN_SEGMENTED_SIZE
+
+
+class SegmentedFD(FileDownloader):
+    def real_download(self, filename, info_dict):
+        session = YoutubeDLSession(self.ydl)
+        url = info_dict['url']
+        headers = info_dict.get('http_headers') or {}
+        tmpfilename = self.temp_name(filename)
+        try:
+            # Sonde systématique, même si la taille est connue : le support de Range est vérifié
+            size = probe_size(session, url, headers)
+        except RangeNotSupported:
+            size = None
+        if not size or size < MIN_SEGMENTED_SIZE:
+            # Serveur sans Range ou fichier trop petit : téléchargeur HTTP habituel
+            return self.fallback(filename, info_dict)
+
+        started = time.time()
+        download = RangeDownload(session, url, tmpfilename, size, headers,
+                                 self.params.get('segmented_connections', 1),
+                                 bandwidth=self.params.get('bandwidth'))
+
+        def on_tick(downloaded):
+            elapsed = time.time() - started
+            speed = downloaded / elapsed if elapsed else None
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': size,
+                'filename': filename,
+                'tmpfilename': tmpfilename,
+                'bandwidth_limited': True,
+                'elapsed': elapsed,
+                'speed': speed,
+                'eta': (size - downloaded) / speed if speed else None,
+            }, info_dict)
+
+        try:
+            download.run(on_tick)
+        except RangeNotSupported:
+            # Range refusé en cours de route (CDN différent pour les plages suivantes)
+            return self.fallback(filename, info_dict)
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            'status': 'finished',
+            'downloaded_bytes': size,
+            'total_bytes': size,
+            'filename': filename,
+            'elapsed': time.time() - started,
+        }, info_dict)
+        return True
+
+    def fallback(self, filename, info_dict):
+        discard_range_state(self.temp_name(filename))
+        fd = HttpFD(self.ydl, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        return fd.real_download(filename, info_dict)
@@ -1,21 +1,36 @@
+import collections
 import os
 import sys
-import re
-import requests
 import json
 import logging
+import multiprocessing
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, 
                              QPushButton, QProgressBar, QFileDialog, QLabel, QMessageBox, 
-                             QComboBox, QTabWidget, QTextEdit, QSpinBox, QCheckBox, QListWidget)
-from PyQt5.QtCore import QThread, pyqtSignal, Qt, QSize, QSettings
+                             QComboBox, QTabWidget, QTextEdit, QSpinBox, QCheckBox, QListWidget,
+                             QListWidgetItem, QProgressDialog)
+from PyQt5.QtCore import QThread, QObject, pyqtSignal, Qt, QSize, QSettings, QTimer
 from PyQt5.QtGui import QIcon, QPixmap, QMovie
-import yt_dlp
-from moviepy.editor import VideoFileClip
-from packaging import version
+from cancel import CancelToken, Cancelled
+from conversion import (convert_file, convert_segmented, collect_inputs, BatchConverter, PRESETS, DEFAULT_PRESET,
+                        DEFAULT_NAMING_RULE, CONVERSION_FORMATS)
+from formats import AUDIO_CODECS
+from pipeline import ConversionPipeline
+from progress import format_size, format_speed, format_eta
+from ratelimit import get_bandwidth_limiter, parse_schedule
+from journal import get_job_journal
+from job_queue import (DownloadJob, JobQueue, QUEUED, RUNNING, PAUSED, FINISHED, STOPPED, FAILED, ACTIVE_STATES,
+                       DONE_STATES)
 from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtWidgets import QMessageBox
 import logging
 
+# yt-dlp, requests et packaging ne sont importés qu'à la première utilisation :
+# la fenêtre s'affiche sans attendre leur chargement (sensible avec PyInstaller onefile)
+UPDATE_CHECK_DELAY = 5000  # ms
+LOG_BUFFER_LINES = 1000
+RELEASE_API_URL = "https://api.github.com/repos/leg234-png/Youtube-Downloader/releases/latest"
+UPDATE_ASSET_NAME = "YouTubeDownloader.exe"
+
 # Configuration du logging
 logging.basicConfig(filename='youtube_downloader.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -31,207 +46,315 @@ class ThumbnailThread(QThread):
     thumbnail_ready = pyqtSignal(QPixmap, str, list)
     error = pyqtSignal(str)
     is_playlist = pyqtSignal(bool)
+    entry_count = pyqtSignal(int)
 
     def __init__(self, url):
         super().__init__()
         self.url = url
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def reinstate(self):
+        # Annulation retirée avant le prochain point de contrôle : le résultat sera émis
+        self.cancel_token.reset()
 
     def run(self):
         try:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(self.url, download=False)
-                if 'entries' in info:
-                    self.is_playlist.emit(True)
-                    video_info = info['entries'][0]
-                else:
-                    self.is_playlist.emit(False)
-                    video_info = info
-
-                thumbnail_url = video_info['thumbnail']
-                title = video_info['title']
-                
-                formats = video_info['formats']
-                available_qualities = ['best']
-                for format in formats:
-                    if 'height' in format and format['height']:
-                        quality = f"{format['height']}p"
-                        if quality not in available_qualities:
-                            available_qualities.append(quality)
-                
-                available_qualities = sorted(available_qualities, key=lambda x: int(x[:-1]) if x != 'best' else float('inf'), reverse=True)
-
-                response = requests.get(thumbnail_url)
-                pixmap = QPixmap()
-                pixmap.loadFromData(response.content)
-                self.thumbnail_ready.emit(pixmap, title, available_qualities)
+            from probe import probe_url
+
+            record = probe_url(self.url, cancel_token=self.cancel_token)
+            if self.cancel_token.cancelled:
+                return
+            self.is_playlist.emit(record['is_playlist'])
+            self.entry_count.emit(record.get('entry_count') or 0)
+            pixmap = QPixmap()
+            pixmap.loadFromData(record['thumbnail'])
+            self.thumbnail_ready.emit(pixmap, record['title'], record['qualities'])
+        except Cancelled:
+            pass
         except Exception as e:
             logging.error(f"Error in ThumbnailThread: {str(e)}")
-            self.error.emit(str(e))
+            if not self.cancel_token.cancelled:
+                self.error.emit(str(e))
 
 class DownloadThread(QThread):
-    progress = pyqtSignal(float)
+    progress = pyqtSignal(float, float, int, float)
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    message = pyqtSignal(str)
 
-    def __init__(self, url, save_path, quality, is_playlist, extract_audio=False):
+    def __init__(self, url, save_path, quality, is_playlist, extract_audio=False, keep_partial=True,
+                 on_file_ready=None, audio_codec='mp3', connections=1, fragment_connections=1,
+                 use_archive=False, journal_id=None):
         super().__init__()
-        self.url = url
-        self.save_path = save_path
-        self.quality = quality
-        self.is_playlist = is_playlist
-        self.extract_audio = extract_audio
-        self.current_video = 0
-        self.total_videos = 1
-        self.current_progress = 0
-        self.paused = False
-        self.stopped = False
-        self.ydl = None
+        from download_core import DownloadEngine
 
-    def run(self):
-        try:
-            video_opts = {
-                'outtmpl': os.path.join(self.save_path, '%(title)s.%(ext)s'),
-                'progress_hooks': [self.progress_hook],
-                'format': self.quality,
-                'continuedl': True,
-            }
-            
-            if self.extract_audio:
-                video_opts['postprocessors'] = [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }]
-                video_opts['format'] = 'bestaudio/best'
-            
-            if self.is_playlist:
-                video_opts['yes_playlist'] = True
-            else:
-                video_opts['no_playlist'] = True
-
-            self.ydl = yt_dlp.YoutubeDL(video_opts)
-            info = self.ydl.extract_info(self.url, download=False)
-            if self.is_playlist:
-                self.total_videos = len(info['entries'])
-            
-            while not self.stopped:
-                try:
-                    self.ydl.download([self.url])
-                    break
-                except Exception as e:
-                    if "HTTP Error 429" in str(e):
-                        self.error.emit("Trop de requêtes. Réessai dans 60 secondes...")
-                        for i in range(60):
-                            if self.stopped:
-                                return
-                            self.sleep(1)
-                    else:
-                        raise
-
-            if not self.stopped:
-                subtitle_opts = {
-                    'skip_download': True,
-                    'writesubtitles': True,
-                    'subtitleslangs': ['fr'],
-                    'subtitlesformat': 'vtt',
-                    'outtmpl': os.path.join(self.save_path, '%(title)s.%(ext)s'),
-                }
-                
-                if self.is_playlist:
-                    subtitle_opts['yes_playlist'] = True
-                else:
-                    subtitle_opts['no_playlist'] = True
+        self.engine = DownloadEngine(url, save_path, quality, is_playlist, extract_audio, audio_codec,
+                                     on_progress=self.emit_progress, on_message=self.message.emit,
+                                     keep_partial=keep_partial, on_file_ready=on_file_ready,
+                                     connections=connections, fragment_connections=fragment_connections,
+                                     use_archive=use_archive, journal_id=journal_id)
+
+    def emit_progress(self, progress, speed, eta, remaining):
+        self.progress.emit(progress, speed or 0.0, -1 if eta is None else int(eta),
+                           -1.0 if remaining is None else float(remaining))
 
-                with yt_dlp.YoutubeDL(subtitle_opts) as ydl:
-                    ydl.download([self.url])
+    @property
+    def paused(self):
+        return self.engine.paused
 
-                self.progress.emit(100)
+    def run(self):
+        try:
+            if self.engine.run():
+                self.progress.emit(100, 0.0, 0, 0.0)
                 self.finished.emit()
         except Exception as e:
             logging.error(f"Error in DownloadThread: {str(e)}")
             self.error.emit(str(e))
 
-    def progress_hook(self, d):
-        if d['status'] == 'downloading':
-            while self.paused:
-                self.sleep(1)
-                if self.stopped:
-                    return
-            
-            p = d.get('_percent_str', '0%')
-            p = p.replace('%','').strip()
-            p = re.sub(r'\x1b\[[0-9;]*m', '', p)
-            try:
-                video_progress = float(p)
-                self.current_progress = (self.current_video * 100 + video_progress) / self.total_videos
-                self.progress.emit(self.current_progress)
-            except ValueError:
-                pass
-        elif d['status'] == 'finished':
-            self.current_video += 1
-            self.current_progress = (self.current_video * 100) / self.total_videos
-            self.progress.emit(self.current_progress)
-
     def pause(self):
-        self.paused = True
+        self.engine.pause()
 
     def resume(self):
-        self.paused = False
+        self.engine.resume()
 
     def stop(self):
-        self.stopped = True
-        if self.ydl:
-            self.ydl.params['abort'] = True
+        self.engine.stop()
+
+class DownloadManager(QObject):
+    job_changed = pyqtSignal(int)
+    job_progress = pyqtSignal(int, float)
+    job_error = pyqtSignal(int, str)
+    job_message = pyqtSignal(int, str)
+    queue_finished = pyqtSignal()
+    conversion_status = pyqtSignal(str, str, str)
+
+    def __init__(self, max_concurrent=1, parent=None):
+        super().__init__(parent)
+        self.queue = JobQueue(max_concurrent)
+        self.threads = {}
+        self.pipeline = None
+        self.conversion_threads = 0
+        self.conversion_preset = DEFAULT_PRESET
+
+    def set_conversion_options(self, threads, preset):
+        self.conversion_threads = threads
+        self.conversion_preset = preset
+        if self.pipeline:
+            self.pipeline.threads = threads
+            self.pipeline.preset = preset
+
+    def conversion_pipeline(self):
+        # Étape de conversion partagée par tous les téléchargements, démarrée à la première utilisation
+        if self.pipeline is None:
+            self.pipeline = ConversionPipeline(threads=self.conversion_threads, preset=self.conversion_preset,
+                                               on_status=self.conversion_status.emit)
+            self.pipeline.start()
+        return self.pipeline
+
+    def set_max_concurrent(self, max_concurrent):
+        self.queue.max_concurrent = max(1, int(max_concurrent))
+        self.schedule()
+
+    def submit(self, job):
+        if job.journal_id is None:
+            job.journal_id = get_job_journal().add_job(job)
+        self.queue.submit(job)
+        self.job_changed.emit(job.job_id)
+        self.schedule()
+        return job
+
+    def restore_journal(self):
+        # Travaux interrompus par une fermeture ou un plantage : repris là où ils s'étaient arrêtés
+        jobs = get_job_journal().unfinished_jobs()
+        for job in jobs:
+            self.queue.submit(job)
+            self.job_changed.emit(job.job_id)
+        self.schedule()
+        return jobs
+
+    def record_state(self, job):
+        # Seuls les travaux non terminés restent dans le journal
+        if job.journal_id is None:
+            return
+        if job.state in DONE_STATES:
+            get_job_journal().remove_job(job.journal_id)
+        else:
+            get_job_journal().set_state(job.journal_id, job.state)
+
+    def schedule(self):
+        # Les threads terminés ne sont libérés qu'une fois réellement arrêtés
+        for job_id in [job_id for job_id, thread in self.threads.items() if not thread.isRunning()]:
+            del self.threads[job_id]
+
+        for job in self.queue.take_runnable():
+            thread = self.threads.get(job.job_id)
+            if thread is not None:
+                # Travail repris après une pause : le thread attend toujours
+                thread.resume()
+                self.job_changed.emit(job.job_id)
+                continue
+            on_file_ready = None
+            if job.convert_format:
+                pipeline = self.conversion_pipeline()
+                on_file_ready = (lambda filepath, cancel_token, target_format=job.convert_format:
+                                 pipeline.submit(filepath, target_format, cancel_token))
+            thread = DownloadThread(job.url, job.save_path, job.quality, job.is_playlist, job.extract_audio,
+                                    job.keep_partial, on_file_ready, job.audio_codec, job.connections,
+                                    job.fragment_connections, job.use_archive, job.journal_id)
+            thread.progress.connect(lambda progress, speed, eta, remaining, job_id=job.job_id:
+                                    self.on_progress(job_id, progress, speed, eta, remaining))
+            thread.finished.connect(lambda job_id=job.job_id: self.on_finished(job_id))
+            thread.error.connect(lambda error_msg, job_id=job.job_id: self.on_error(job_id, error_msg))
+            thread.message.connect(lambda message, job_id=job.job_id: self.job_message.emit(job_id, message))
+            self.threads[job.job_id] = thread
+            thread.start()
+            self.job_changed.emit(job.job_id)
+
+    def on_progress(self, job_id, progress, speed, eta, remaining):
+        job = self.queue.get(job_id)
+        if job:
+            job.progress = progress
+            job.speed = speed
+            job.eta = eta
+            job.remaining = remaining
+            self.job_progress.emit(job_id, progress)
+
+    def on_finished(self, job_id):
+        job = self.queue.get(job_id)
+        if job and job.state in ACTIVE_STATES:
+            job.progress = 100
+            self.queue.set_state(job_id, FINISHED)
+            self.record_state(job)
+        self.job_changed.emit(job_id)
+        self.schedule()
+        if self.queue.is_idle():
+            self.queue_finished.emit()
+
+    def on_error(self, job_id, error_msg):
+        job = self.queue.get(job_id)
+        if job and job.state == STOPPED:
+            return
+        job = self.queue.set_state(job_id, FAILED, error_msg)
+        if job:
+            self.record_state(job)
+        self.job_changed.emit(job_id)
+        self.job_error.emit(job_id, error_msg)
+        self.schedule()
+
+    def pause(self, job_id):
+        job = self.queue.get(job_id)
+        if job and job.state == RUNNING and job_id in self.threads:
+            self.threads[job_id].pause()
+            self.queue.set_state(job_id, PAUSED)
+            self.record_state(job)
+            self.job_changed.emit(job_id)
+            self.schedule()
+
+    def resume(self, job_id):
+        job = self.queue.get(job_id)
+        if job and job.state == PAUSED:
+            # Le travail reprend dès qu'un emplacement est libre ; un travail restauré
+            # du journal n'a pas encore de thread, schedule() en crée un
+            self.queue.set_state(job_id, QUEUED)
+            self.record_state(job)
+            self.job_changed.emit(job_id)
+            self.schedule()
+
+    def stop(self, job_id):
+        # Pas de wait() : le thread se termine de lui-même sans bloquer l'interface
+        job = self.queue.get(job_id)
+        if not job:
+            return
+        thread = self.threads.get(job_id)
+        if thread and thread.isRunning():
+            thread.stop()
+        if job.state in (QUEUED,) + ACTIVE_STATES:
+            job.progress = 0
+            self.queue.set_state(job_id, STOPPED)
+            self.record_state(job)
+        self.job_changed.emit(job_id)
+        self.schedule()
+
+    def move(self, job_id, offset):
+        new_index = self.queue.move(job_id, offset)
+        self.job_changed.emit(job_id)
+        return new_index
 
 class ConversionThread(QThread):
     progress = pyqtSignal(float)
     finished = pyqtSignal()
     error = pyqtSignal(str)
+    cancelled = pyqtSignal()
 
-    def __init__(self, input_file, output_file, target_format):
+    def __init__(self, input_file, output_file, target_format, threads=0, preset=DEFAULT_PRESET, segmented=False):
         super().__init__()
         self.input_file = input_file
         self.output_file = output_file
         self.target_format = target_format
+        self.threads = threads
+        self.preset = preset
+        self.segmented = segmented
+        self.cancel_token = CancelToken()
 
     def run(self):
         try:
-            clip = VideoFileClip(self.input_file)
-            total_duration = clip.duration
-            
-            def progress_callback(t):
-                progress = (t / total_duration) * 100
-                self.progress.emit(progress)
-
-            if self.target_format == 'mp3':
-                clip.audio.write_audiofile(self.output_file, progress_callback=progress_callback)
-            else:
-                clip.write_videofile(self.output_file, codec='libx264', audio_codec='aac', progress_callback=progress_callback)
-            
-            clip.close()
+            convert = convert_segmented if self.segmented else convert_file
+            plan = convert(self.input_file, self.output_file, self.target_format, self.threads, self.preset,
+                           on_progress=self.progress.emit, cancel_token=self.cancel_token)
+            logging.info(f"Conversion terminée : vidéo={plan.video_codec}, audio={plan.audio_codec}")
             self.finished.emit()
+        except Cancelled:
+            self.cancelled.emit()
         except Exception as e:
             logging.error(f"Error in ConversionThread: {str(e)}")
             self.error.emit(str(e))
 
+    def cancel(self):
+        self.cancel_token.cancel()
+
+class BatchConversionThread(QThread):
+    file_status = pyqtSignal(str, str, str)
+    throughput = pyqtSignal(int, int, int, float)
+    finished = pyqtSignal(int, int)
+    error = pyqtSignal(str)
+
+    def __init__(self, files, output_dir, target_format, naming_rule, workers, threads=0, preset=DEFAULT_PRESET):
+        super().__init__()
+        self.converter = BatchConverter(files, output_dir, target_format, naming_rule, workers, threads, preset,
+                                        on_status=self.file_status.emit, on_throughput=self.throughput.emit)
+
+    def run(self):
+        try:
+            done, failed = self.converter.run()
+            self.finished.emit(done, failed)
+        except Exception as e:
+            logging.error(f"Error in BatchConversionThread: {str(e)}")
+            self.error.emit(str(e))
+
+    def cancel(self):
+        self.converter.cancel()
+
 class UpdateChecker(QThread):
-    update_available = pyqtSignal(str, str)
+    update_available = pyqtSignal(str, str, str)
     error = pyqtSignal(str)
 
-    def __init__(self, current_version, check_interval=3600):
+    def __init__(self, current_version, check_interval=3600, release_url=RELEASE_API_URL):
         super().__init__()
         self.current_version = current_version
         self.check_interval = check_interval  # Intervalle de vérification en secondes
-        self.github_api_url = "https://api.github.com/repos/leg234-png/Youtube-Downloader/releases/latest"
+        self.github_api_url = release_url
 
     def run(self):
+        from packaging import version
+        from http_pool import get_session
+        from updater import find_checksum_url
+
         while True:
             try:
-                response = requests.get(self.github_api_url)
+                response = get_session().get(self.github_api_url, timeout=30)
                 response.raise_for_status()
                 latest_release = response.json()
                 latest_version = latest_release['tag_name'].lstrip('v')
@@ -239,12 +362,13 @@ class UpdateChecker(QThread):
                 if version.parse(latest_version) > version.parse(self.current_version):
                     download_url = None
                     for asset in latest_release['assets']:
-                        if asset['name'] == 'YouTubeDownloader.exe':
+                        if asset['name'] == UPDATE_ASSET_NAME:
                             download_url = asset['browser_download_url']
                             break
                     
                     if download_url:
-                        self.update_available.emit(latest_version, download_url)
+                        checksum_url = find_checksum_url(latest_release, UPDATE_ASSET_NAME) or ''
+                        self.update_available.emit(latest_version, download_url, checksum_url)
                     else:
                         self.error.emit("Fichier de mise à jour non trouvé")
                 
@@ -254,18 +378,73 @@ class UpdateChecker(QThread):
                 self.error.emit(str(e))
                 self.sleep(self.check_interval)  # Attendre avant de réessayer même en cas d'erreur
 
+class UpdateDownloadThread(QThread):
+    progress = pyqtSignal(float, float)
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, download_url, save_path, checksum_url):
+        super().__init__()
+        self.download_url = download_url
+        self.save_path = save_path
+        self.checksum_url = checksum_url
+        self.cancel_token = CancelToken()
+
+    def run(self):
+        from updater import UpdateDownloader
+
+        downloader = UpdateDownloader(
+            self.download_url, self.save_path, checksum_url=self.checksum_url or None,
+            on_progress=lambda received, total: self.progress.emit(received, total or 0),
+            cancel_token=self.cancel_token)
+        try:
+            self.finished.emit(downloader.run())
+        except Cancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            logging.error(f"Error in UpdateDownloadThread: {str(e)}")
+            self.error.emit(str(e))
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
 class YouTubeDownloader(QWidget):
     def __init__(self):
         super().__init__()
+        self.settings = QSettings("YourCompany", "YouTubeDownloader")
+        # Messages reçus avant la construction de l'onglet Journal
+        self.pending_log = collections.deque(maxlen=LOG_BUFFER_LINES)
+        self.spinner = None
         self.initUI()
         self.is_playlist = False
-        self.thumbnail_thread = None
+        self.entry_count = 0
+        self.preview_url = None
+        self.preview_done = False
+        self.preview_threads = {}
+        self.retired_preview_threads = []
         self.download_thread = None
         self.conversion_thread = None
-        self.settings = QSettings("YourCompany", "YouTubeDownloader")
+        self.batch_thread = None
+        self.update_thread = None
+        self.current_title = ""
+        self.preview_timer = QTimer(self)
+        self.preview_timer.timeout.connect(self.start_validate_url)
+        self.preview_timer.setSingleShot(True)
+        self.download_manager = DownloadManager(parent=self)
+        self.download_manager.job_changed.connect(self.refresh_job_item)
+        self.download_manager.job_progress.connect(self.update_progress)
+        self.download_manager.job_error.connect(self.show_error)
+        self.download_manager.job_message.connect(self.show_job_message)
+        self.download_manager.conversion_status.connect(self.show_pipeline_status)
+        self.download_manager.queue_finished.connect(self.download_finished)
         self.load_settings()
+        restored = self.download_manager.restore_journal()
+        if restored:
+            self.log_message(f"{len(restored)} téléchargement(s) repris depuis la dernière session")
         self.current_version = "1.0.0"
-        self.start_update_checker()
+        # La vérification des mises à jour (requête réseau) attend que la fenêtre soit affichée
+        QTimer.singleShot(UPDATE_CHECK_DELAY, self.start_update_checker)
 
     def start_update_checker(self):
         self.update_checker = UpdateChecker(self.current_version)
@@ -273,28 +452,55 @@ class YouTubeDownloader(QWidget):
         self.update_checker.error.connect(self.log_update_error)
         self.update_checker.start()
     
-    def show_update_dialog(self, new_version, download_url):
+    def show_update_dialog(self, new_version, download_url, checksum_url):
+        if self.update_thread and self.update_thread.isRunning():
+            return
         reply = QMessageBox.question(self, 'Mise à jour disponible',
                                      f"Une nouvelle version ({new_version}) est disponible. Voulez-vous la télécharger?",
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
         if reply == QMessageBox.Yes:
-            self.start_update_download(download_url)
-    def start_update_download(self, download_url):
-        try:
-            response = requests.get(download_url, stream=True)
-            response.raise_for_status()
-            
-            save_path = QFileDialog.getSaveFileName(self, "Sauvegarder la nouvelle version", "YouTubeDownloader_new.exe", "Executable (*.exe)")[0]
-            
-            if save_path:
-                with open(save_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                QMessageBox.information(self, "Mise à jour téléchargée", f"La nouvelle version a été téléchargée vers {save_path}. Veuillez fermer l'application actuelle et lancer la nouvelle version.")
-            else:
-                QMessageBox.information(self, "Téléchargement annulé", "Le téléchargement de la mise à jour a été annulé.")
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur de téléchargement", f"Une erreur est survenue lors du téléchargement de la mise à jour : {str(e)}")
+            self.start_update_download(download_url, checksum_url)
+    def start_update_download(self, download_url, checksum_url):
+        save_path = QFileDialog.getSaveFileName(self, "Sauvegarder la nouvelle version", "YouTubeDownloader_new.exe", "Executable (*.exe)")[0]
+        if not save_path:
+            QMessageBox.information(self, "Téléchargement annulé", "Le téléchargement de la mise à jour a été annulé.")
+            return
+
+        # Transfert dans un thread : la fenêtre reste réactive, un .part existant est repris
+        self.update_progress_dialog = QProgressDialog("Téléchargement de la mise à jour...", "Annuler", 0, 100, self)
+        self.update_progress_dialog.setWindowTitle("Mise à jour")
+        self.update_progress_dialog.setAutoClose(False)
+        self.update_progress_dialog.setAutoReset(False)
+        self.update_thread = UpdateDownloadThread(download_url, save_path, checksum_url)
+        self.update_thread.progress.connect(self.update_download_progress)
+        self.update_thread.finished.connect(self.update_download_finished)
+        self.update_thread.error.connect(self.update_download_error)
+        self.update_thread.cancelled.connect(self.update_download_cancelled)
+        self.update_progress_dialog.canceled.connect(self.update_thread.cancel)
+        self.update_progress_dialog.show()
+        self.update_thread.start()
+
+    def update_download_progress(self, received, total):
+        if total:
+            self.update_progress_dialog.setRange(0, 100)
+            self.update_progress_dialog.setValue(int(received * 100 / total))
+            self.update_progress_dialog.setLabelText(
+                f"Téléchargement de la mise à jour : {format_size(received)} / {format_size(total)}")
+        else:
+            self.update_progress_dialog.setRange(0, 0)
+            self.update_progress_dialog.setLabelText(f"Téléchargement de la mise à jour : {format_size(received)}")
+
+    def update_download_finished(self, save_path):
+        self.update_progress_dialog.close()
+        QMessageBox.information(self, "Mise à jour téléchargée", f"La nouvelle version a été téléchargée et vérifiée (SHA-256) vers {save_path}. Veuillez fermer l'application actuelle et lancer la nouvelle version.")
+
+    def update_download_error(self, error_msg):
+        self.update_progress_dialog.close()
+        QMessageBox.critical(self, "Erreur de téléchargement", f"Une erreur est survenue lors du téléchargement de la mise à jour : {error_msg}")
+
+    def update_download_cancelled(self):
+        self.update_progress_dialog.close()
+        self.log_message("Téléchargement de la mise à jour interrompu ; il reprendra au prochain essai")
 
     def log_update_error(self, error_msg):
         logging.error(f"Erreur lors de la vérification des mises à jour : {error_msg}")
@@ -314,23 +520,16 @@ class YouTubeDownloader(QWidget):
         self.setup_download_ui(download_layout)
         self.tab_widget.addTab(download_tab, "Téléchargement")
 
-        # Onglet de conversion
-        conversion_tab = QWidget()
-        conversion_layout = QVBoxLayout(conversion_tab)
-        self.setup_conversion_ui(conversion_layout)
-        self.tab_widget.addTab(conversion_tab, "Conversion")
-
-        # Onglet de configuration
-        config_tab = QWidget()
-        config_layout = QVBoxLayout(config_tab)
-        self.setup_config_ui(config_layout)
-        self.tab_widget.addTab(config_tab, "Configuration")
-
-        # Onglet de journalisation
-        log_tab = QWidget()
-        log_layout = QVBoxLayout(log_tab)
-        self.setup_log_ui(log_layout)
-        self.tab_widget.addTab(log_tab, "Journal")
+        # Onglets de conversion, de configuration et de journalisation : construits
+        # seulement à leur premier affichage
+        self.tab_builders = {}
+        for title, builder in (("Conversion", self.setup_conversion_ui),
+                               ("Configuration", self.setup_config_ui),
+                               ("Journal", self.setup_log_ui)):
+            tab = QWidget()
+            QVBoxLayout(tab)
+            self.tab_builders[self.tab_widget.addTab(tab, title)] = builder
+        self.tab_widget.currentChanged.connect(self.build_tab)
 
         self.setLayout(layout)
         self.setWindowTitle('YouTube Downloader')
@@ -339,10 +538,18 @@ class YouTubeDownloader(QWidget):
         icon_path = resource_path("youtube_downloader.ico")
         self.setWindowIcon(QIcon(icon_path))
 
+    def build_tab(self, index):
+        builder = self.tab_builders.pop(index, None)
+        if builder:
+            builder(self.tab_widget.widget(index).layout())
+
+    def tab_built(self, builder):
+        return builder not in self.tab_builders.values()
+
     def setup_download_ui(self, layout):
         url_layout = QHBoxLayout()
         self.url_input = QLineEdit()
-        self.url_input.textChanged.connect(self.start_validate_url)
+        self.url_input.textChanged.connect(self.on_url_changed)
         url_layout.addWidget(QLabel("URL:"))
         url_layout.addWidget(self.url_input)
         layout.addLayout(url_layout)
@@ -353,9 +560,6 @@ class YouTubeDownloader(QWidget):
         self.preview_label.setStyleSheet("QLabel { background-color: #f0f0f0; }")
         layout.addWidget(self.preview_label)
 
-        self.spinner = QMovie(resource_path("spinner.gif"))
-        self.spinner.setScaledSize(QSize(320, 180))
-        self.preview_label.setMovie(self.spinner)
 
         self.title_label = QLabel()
         self.title_label.setAlignment(Qt.AlignCenter)
@@ -368,8 +572,22 @@ class YouTubeDownloader(QWidget):
         quality_layout.addWidget(self.quality_combo)
         layout.addLayout(quality_layout)
 
-        self.extract_audio_checkbox = QCheckBox("Extraire l'audio (MP3)")
-        layout.addWidget(self.extract_audio_checkbox)
+        audio_layout = QHBoxLayout()
+        self.extract_audio_checkbox = QCheckBox("Extraire l'audio")
+        self.audio_codec_combo = QComboBox()
+        self.audio_codec_combo.addItems(AUDIO_CODECS)
+        audio_layout.addWidget(self.extract_audio_checkbox)
+        audio_layout.addWidget(QLabel("Format audio:"))
+        audio_layout.addWidget(self.audio_codec_combo)
+        layout.addLayout(audio_layout)
+
+        auto_convert_layout = QHBoxLayout()
+        self.auto_convert_checkbox = QCheckBox("Convertir automatiquement après téléchargement en")
+        self.auto_convert_format_combo = QComboBox()
+        self.auto_convert_format_combo.addItems(CONVERSION_FORMATS)
+        auto_convert_layout.addWidget(self.auto_convert_checkbox)
+        auto_convert_layout.addWidget(self.auto_convert_format_combo)
+        layout.addLayout(auto_convert_layout)
 
         button_layout = QHBoxLayout()
         self.download_btn = QPushButton('Télécharger')
@@ -391,6 +609,24 @@ class YouTubeDownloader(QWidget):
         self.progress_label = QLabel()
         layout.addWidget(self.progress_label)
 
+        # File d'attente des téléchargements
+        layout.addWidget(QLabel("File d'attente:"))
+        self.queue_list = QListWidget()
+        self.queue_list.currentItemChanged.connect(self.on_job_selected)
+        layout.addWidget(self.queue_list)
+
+        queue_button_layout = QHBoxLayout()
+        self.move_up_btn = QPushButton('Monter')
+        self.move_up_btn.clicked.connect(lambda: self.move_selected_job(-1))
+        self.move_down_btn = QPushButton('Descendre')
+        self.move_down_btn.clicked.connect(lambda: self.move_selected_job(1))
+        self.clear_done_btn = QPushButton('Nettoyer la liste')
+        self.clear_done_btn.clicked.connect(self.clear_done_jobs)
+        queue_button_layout.addWidget(self.move_up_btn)
+        queue_button_layout.addWidget(self.move_down_btn)
+        queue_button_layout.addWidget(self.clear_done_btn)
+        layout.addLayout(queue_button_layout)
+
     def setup_conversion_ui(self, layout):
         self.input_file_edit = QLineEdit()
         self.input_file_btn = QPushButton("Choisir le fichier d'entrée")
@@ -411,13 +647,35 @@ class YouTubeDownloader(QWidget):
         layout.addLayout(output_layout)
 
         self.format_combo = QComboBox()
-        self.format_combo.addItems(['mp4', 'avi', 'mkv', 'mp3'])
+        self.format_combo.addItems(CONVERSION_FORMATS)
         layout.addWidget(QLabel("Format de sortie:"))
         layout.addWidget(self.format_combo)
 
+        encoder_layout = QHBoxLayout()
+        self.conversion_threads_spin = QSpinBox()
+        self.conversion_threads_spin.setRange(0, os.cpu_count() or 64)
+        self.conversion_threads_spin.setSpecialValueText("Auto")
+        self.conversion_preset_combo = QComboBox()
+        self.conversion_preset_combo.addItems(PRESETS)
+        self.conversion_preset_combo.setCurrentText(DEFAULT_PRESET)
+        encoder_layout.addWidget(QLabel("Threads d'encodage:"))
+        encoder_layout.addWidget(self.conversion_threads_spin)
+        encoder_layout.addWidget(QLabel("Preset:"))
+        encoder_layout.addWidget(self.conversion_preset_combo)
+        layout.addLayout(encoder_layout)
+
+        self.segmented_conversion_checkbox = QCheckBox("Encodage parallèle par segments (vidéos longues)")
+        layout.addWidget(self.segmented_conversion_checkbox)
+
+        conversion_button_layout = QHBoxLayout()
         self.convert_btn = QPushButton("Convertir")
         self.convert_btn.clicked.connect(self.start_conversion)
-        layout.addWidget(self.convert_btn)
+        self.cancel_conversion_btn = QPushButton("Annuler")
+        self.cancel_conversion_btn.clicked.connect(self.cancel_conversion)
+        self.cancel_conversion_btn.setEnabled(False)
+        conversion_button_layout.addWidget(self.convert_btn)
+        conversion_button_layout.addWidget(self.cancel_conversion_btn)
+        layout.addLayout(conversion_button_layout)
 
         self.conversion_progress_bar = QProgressBar()
         layout.addWidget(self.conversion_progress_bar)
@@ -425,6 +683,60 @@ class YouTubeDownloader(QWidget):
         self.conversion_label = QLabel()
         layout.addWidget(self.conversion_label)
 
+        # Conversion par lot
+        layout.addWidget(QLabel("Conversion par lot:"))
+        self.batch_list = QListWidget()
+        layout.addWidget(self.batch_list)
+
+        batch_input_layout = QHBoxLayout()
+        self.batch_add_files_btn = QPushButton("Ajouter des fichiers")
+        self.batch_add_files_btn.clicked.connect(self.add_batch_files)
+        self.batch_add_folder_btn = QPushButton("Ajouter un dossier")
+        self.batch_add_folder_btn.clicked.connect(self.add_batch_folder)
+        self.batch_clear_btn = QPushButton("Vider")
+        self.batch_clear_btn.clicked.connect(self.batch_list.clear)
+        batch_input_layout.addWidget(self.batch_add_files_btn)
+        batch_input_layout.addWidget(self.batch_add_folder_btn)
+        batch_input_layout.addWidget(self.batch_clear_btn)
+        layout.addLayout(batch_input_layout)
+
+        batch_output_layout = QHBoxLayout()
+        self.batch_output_dir_edit = QLineEdit()
+        self.batch_output_dir_edit.setPlaceholderText("Dossier de sortie (par défaut : dossier du fichier)")
+        self.batch_output_dir_btn = QPushButton("Choisir le dossier de sortie")
+        self.batch_output_dir_btn.clicked.connect(self.choose_batch_output_dir)
+        batch_output_layout.addWidget(self.batch_output_dir_edit)
+        batch_output_layout.addWidget(self.batch_output_dir_btn)
+        layout.addLayout(batch_output_layout)
+
+        batch_options_layout = QHBoxLayout()
+        self.batch_naming_edit = QLineEdit(DEFAULT_NAMING_RULE)
+        self.batch_workers_spin = QSpinBox()
+        self.batch_workers_spin.setRange(1, os.cpu_count() or 1)
+        self.batch_workers_spin.setValue(max(1, (os.cpu_count() or 1) // 2))
+        batch_options_layout.addWidget(QLabel("Nommage:"))
+        batch_options_layout.addWidget(self.batch_naming_edit)
+        batch_options_layout.addWidget(QLabel("Processus:"))
+        batch_options_layout.addWidget(self.batch_workers_spin)
+        layout.addLayout(batch_options_layout)
+
+        batch_button_layout = QHBoxLayout()
+        self.batch_start_btn = QPushButton("Convertir le lot")
+        self.batch_start_btn.clicked.connect(self.start_batch_conversion)
+        self.batch_cancel_btn = QPushButton("Annuler le lot")
+        self.batch_cancel_btn.clicked.connect(self.cancel_batch_conversion)
+        self.batch_cancel_btn.setEnabled(False)
+        batch_button_layout.addWidget(self.batch_start_btn)
+        batch_button_layout.addWidget(self.batch_cancel_btn)
+        layout.addLayout(batch_button_layout)
+
+        self.batch_label = QLabel()
+        layout.addWidget(self.batch_label)
+
+        self.conversion_threads_spin.setValue(self.setting_int("conversion_threads", 0))
+        self.conversion_preset_combo.setCurrentText(self.settings.value("conversion_preset", DEFAULT_PRESET))
+        self.segmented_conversion_checkbox.setChecked(self.setting_bool("conversion_segmented", False))
+
     def setup_config_ui(self, layout):
         self.default_save_path_edit = QLineEdit()
         self.default_save_path_btn = QPushButton("Choisir le dossier de sauvegarde par défaut")
@@ -445,10 +757,63 @@ class YouTubeDownloader(QWidget):
         layout.addWidget(QLabel("Nombre maximum de téléchargements simultanés:"))
         layout.addWidget(self.max_downloads_spin)
 
+        self.fragment_connections_spin = QSpinBox()
+        self.fragment_connections_spin.setRange(1, 16)
+        layout.addWidget(QLabel("Fragments récupérés en parallèle (flux HLS/DASH):"))
+        layout.addWidget(self.fragment_connections_spin)
+
+        self.connections_spin = QSpinBox()
+        self.connections_spin.setRange(1, 16)
+        layout.addWidget(QLabel("Connexions par fichier (1 = désactivé, gros fichiers uniquement):"))
+        layout.addWidget(self.connections_spin)
+
+        self.keep_partial_checkbox = QCheckBox("Conserver les fichiers partiels (.part) à l'arrêt")
+        layout.addWidget(self.keep_partial_checkbox)
+
+        self.use_archive_checkbox = QCheckBox("Ignorer les vidéos déjà téléchargées (archive des téléchargements)")
+        layout.addWidget(self.use_archive_checkbox)
+
+        self.clear_cache_btn = QPushButton("Vider le cache des aperçus")
+        self.clear_cache_btn.clicked.connect(self.clear_metadata_cache)
+        self.clear_archive_btn = QPushButton("Vider l'archive des téléchargements")
+        self.clear_archive_btn.clicked.connect(self.clear_download_archive)
+        maintenance_layout = QHBoxLayout()
+        maintenance_layout.addWidget(self.clear_cache_btn)
+        maintenance_layout.addWidget(self.clear_archive_btn)
+        layout.addLayout(maintenance_layout)
+
+        self.total_bandwidth_spin = QSpinBox()
+        self.total_bandwidth_spin.setRange(0, 1000000)
+        self.total_bandwidth_spin.setSuffix(" Kio/s")
+        layout.addWidget(QLabel("Débit maximum total (0 = illimité):"))
+        layout.addWidget(self.total_bandwidth_spin)
+
+        self.job_bandwidth_spin = QSpinBox()
+        self.job_bandwidth_spin.setRange(0, 1000000)
+        self.job_bandwidth_spin.setSuffix(" Kio/s")
+        layout.addWidget(QLabel("Débit maximum par téléchargement (0 = illimité):"))
+        layout.addWidget(self.job_bandwidth_spin)
+
+        self.bandwidth_schedule_edit = QLineEdit()
+        self.bandwidth_schedule_edit.setPlaceholderText("08:00-18:00=500; 22:00-07:00=0")
+        layout.addWidget(QLabel("Débit total par plage horaire (Kio/s, remplace la limite totale):"))
+        layout.addWidget(self.bandwidth_schedule_edit)
+
         self.save_config_btn = QPushButton("Sauvegarder la configuration")
         self.save_config_btn.clicked.connect(self.save_settings)
         layout.addWidget(self.save_config_btn)
 
+        self.default_save_path_edit.setText(self.settings.value("default_save_path", ""))
+        self.default_quality_combo.setCurrentText(self.settings.value("default_quality", "best"))
+        self.max_downloads_spin.setValue(self.setting_int("max_downloads", 1))
+        self.keep_partial_checkbox.setChecked(self.setting_bool("keep_partial_files", True))
+        self.connections_spin.setValue(self.setting_int("connections_per_file", 1))
+        self.use_archive_checkbox.setChecked(self.setting_bool("use_download_archive", False))
+        self.fragment_connections_spin.setValue(self.setting_int("fragment_connections", 4))
+        self.total_bandwidth_spin.setValue(self.setting_int("bandwidth_total", 0))
+        self.job_bandwidth_spin.setValue(self.setting_int("bandwidth_per_job", 0))
+        self.bandwidth_schedule_edit.setText(self.settings.value("bandwidth_schedule", ""))
+
     def setup_log_ui(self, layout):
         self.log_text = QTextEdit()
         self.log_text.setReadOnly(True)
@@ -458,15 +823,59 @@ class YouTubeDownloader(QWidget):
         self.clear_log_btn.clicked.connect(self.clear_log)
         layout.addWidget(self.clear_log_btn)
 
+        for message in self.pending_log:
+            self.log_text.append(message)
+        self.pending_log.clear()
+
+    def setting_int(self, key, default):
+        return int(self.settings.value(key, default))
+
+    def setting_bool(self, key, default):
+        return self.settings.value(key, default) in (True, "true")
+
     def load_settings(self):
-        self.default_save_path_edit.setText(self.settings.value("default_save_path", ""))
-        self.default_quality_combo.setCurrentText(self.settings.value("default_quality", "best"))
-        self.max_downloads_spin.setValue(int(self.settings.value("max_downloads", 1)))
+        # Appliqué sans passer par les widgets : l'onglet Configuration n'existe pas encore
+        try:
+            schedule = parse_schedule(self.settings.value("bandwidth_schedule", ""))
+        except ValueError as e:
+            logging.error(f"Error in load_settings: {str(e)}")
+            schedule = []
+        self.apply_bandwidth_settings(self.setting_int("bandwidth_total", 0),
+                                      self.setting_int("bandwidth_per_job", 0), schedule)
+        self.download_manager.set_conversion_options(self.setting_int("conversion_threads", 0),
+                                                     self.settings.value("conversion_preset", DEFAULT_PRESET))
+        self.download_manager.set_max_concurrent(self.setting_int("max_downloads", 1))
+
+    def apply_bandwidth_settings(self, total_kib, job_kib, schedule):
+        # Appliqué immédiatement, y compris aux téléchargements en cours
+        limiter = get_bandwidth_limiter()
+        limiter.set_limits(total_kib * 1024, job_kib * 1024)
+        limiter.set_schedule(schedule)
 
     def save_settings(self):
+        try:
+            schedule = parse_schedule(self.bandwidth_schedule_edit.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Erreur", str(e))
+            return
         self.settings.setValue("default_save_path", self.default_save_path_edit.text())
         self.settings.setValue("default_quality", self.default_quality_combo.currentText())
         self.settings.setValue("max_downloads", self.max_downloads_spin.value())
+        self.settings.setValue("keep_partial_files", self.keep_partial_checkbox.isChecked())
+        self.settings.setValue("connections_per_file", self.connections_spin.value())
+        self.settings.setValue("use_download_archive", self.use_archive_checkbox.isChecked())
+        self.settings.setValue("fragment_connections", self.fragment_connections_spin.value())
+        self.settings.setValue("bandwidth_total", self.total_bandwidth_spin.value())
+        self.settings.setValue("bandwidth_per_job", self.job_bandwidth_spin.value())
+        self.settings.setValue("bandwidth_schedule", self.bandwidth_schedule_edit.text())
+        self.apply_bandwidth_settings(self.total_bandwidth_spin.value(), self.job_bandwidth_spin.value(), schedule)
+        if self.tab_built(self.setup_conversion_ui):
+            self.settings.setValue("conversion_threads", self.conversion_threads_spin.value())
+            self.settings.setValue("conversion_preset", self.conversion_preset_combo.currentText())
+            self.settings.setValue("conversion_segmented", self.segmented_conversion_checkbox.isChecked())
+        self.download_manager.set_conversion_options(self.setting_int("conversion_threads", 0),
+                                                     self.settings.value("conversion_preset", DEFAULT_PRESET))
+        self.download_manager.set_max_concurrent(self.max_downloads_spin.value())
         QMessageBox.information(self, "Configuration", "Configuration sauvegardée avec succès!")
 
     def choose_default_save_path(self):
@@ -478,21 +887,119 @@ class YouTubeDownloader(QWidget):
         self.log_text.clear()
 
     def log_message(self, message):
-        self.log_text.append(message)
+        if self.tab_built(self.setup_log_ui):
+            self.log_text.append(message)
+        else:
+            self.pending_log.append(message)
         logging.info(message)
 
-    def check_for_updates(self):
-        self.update_checker = UpdateChecker(self.current_version)
-        self.update_checker.update_available.connect(self.show_update_dialog)
-        self.update_checker.start()
+    def clear_metadata_cache(self):
+        from metadata_cache import get_metadata_cache
 
-    def show_update_dialog(self, new_version):
-        reply = QMessageBox.question(self, 'Mise à jour disponible',
-                                     f"Une nouvelle version ({new_version}) est disponible. Voulez-vous la télécharger?",
-                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
-        if reply == QMessageBox.Yes:
-            # Ici, vous pouvez ajouter le code pour télécharger et installer la mise à jour
-            QMessageBox.information(self, "Mise à jour", "La mise à jour va être téléchargée et installée.")
+        get_metadata_cache().clear()
+        self.log_message("Cache des aperçus vidé")
+
+    def clear_download_archive(self):
+        reply = QMessageBox.question(self, "Archive des téléchargements",
+                                     "Toutes les vidéos de l'archive pourront être téléchargées de nouveau. Continuer ?",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        from archive import get_download_archive
+
+        get_download_archive().clear()
+        self.log_message("Archive des téléchargements vidée")
+
+    def closeEvent(self, event):
+        # Le pool n'existe que si yt-dlp a déjà été chargé : pas d'import à la fermeture
+        ydl_pool = sys.modules.get('ydl_pool')
+        if ydl_pool is not None:
+            ydl_pool.get_ydl_pool().close()
+        super().closeEvent(event)
+
+    def add_batch_files(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "Choisir les fichiers à convertir")
+        for file in collect_inputs(files):
+            self.add_batch_item(file)
+
+    def add_batch_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Choisir le dossier à convertir")
+        if folder:
+            for file in collect_inputs([folder]):
+                self.add_batch_item(file)
+
+    def add_batch_item(self, file):
+        item = QListWidgetItem(f"[En attente] {file}")
+        item.setData(Qt.UserRole, file)
+        self.batch_list.addItem(item)
+
+    def choose_batch_output_dir(self):
+        folder = QFileDialog.getExistingDirectory(self, "Choisir le dossier de sortie")
+        if folder:
+            self.batch_output_dir_edit.setText(folder)
+
+    def start_batch_conversion(self):
+        files = [self.batch_list.item(row).data(Qt.UserRole) for row in range(self.batch_list.count())]
+        if not files:
+            QMessageBox.warning(self, "Erreur", "Veuillez ajouter des fichiers à convertir.")
+            return
+
+        for row in range(self.batch_list.count()):
+            item = self.batch_list.item(row)
+            item.setText(f"[En attente] {item.data(Qt.UserRole)}")
+
+        self.batch_thread = BatchConversionThread(files, self.batch_output_dir_edit.text(),
+                                                  self.format_combo.currentText(),
+                                                  self.batch_naming_edit.text() or DEFAULT_NAMING_RULE,
+                                                  self.batch_workers_spin.value(),
+                                                  self.conversion_threads_spin.value(),
+                                                  self.conversion_preset_combo.currentText())
+        self.batch_thread.file_status.connect(self.update_batch_status)
+        self.batch_thread.throughput.connect(self.update_batch_throughput)
+        self.batch_thread.finished.connect(self.batch_conversion_finished)
+        self.batch_thread.error.connect(self.show_batch_error)
+        self.batch_thread.start()
+
+        self.batch_start_btn.setEnabled(False)
+        self.batch_cancel_btn.setEnabled(True)
+        self.batch_label.setText(f"Conversion de {len(files)} fichiers...")
+
+    def cancel_batch_conversion(self):
+        if self.batch_thread:
+            self.batch_thread.cancel()
+            self.batch_cancel_btn.setEnabled(False)
+            self.batch_label.setText("Annulation en cours...")
+
+    def update_batch_status(self, file, status, message):
+        status_labels = {
+            'running': "En cours",
+            'done': "Terminé",
+            'failed': "Erreur",
+            'cancelled': "Annulé",
+        }
+        for row in range(self.batch_list.count()):
+            item = self.batch_list.item(row)
+            if item.data(Qt.UserRole) == file:
+                text = f"[{status_labels[status]}] {file}"
+                item.setText(f"{text} : {message}" if message else text)
+                break
+        if status == 'failed':
+            self.log_message(f"Erreur lors de la conversion de {file} : {message}")
+
+    def update_batch_throughput(self, done, failed, total, bytes_per_second):
+        self.batch_label.setText(f"{done + failed}/{total} fichiers traités ({failed} erreurs) - "
+                                 f"débit total : {format_speed(bytes_per_second)}")
+
+    def batch_conversion_finished(self, done, failed):
+        self.batch_start_btn.setEnabled(True)
+        self.batch_cancel_btn.setEnabled(False)
+        self.log_message(f"Conversion par lot terminée : {done} réussies, {failed} en erreur")
+
+    def show_batch_error(self, error_msg):
+        QMessageBox.critical(self, "Erreur", f"Une erreur est survenue lors de la conversion par lot : {error_msg}")
+        self.batch_start_btn.setEnabled(True)
+        self.batch_cancel_btn.setEnabled(False)
+        self.batch_label.setText("Erreur lors de la conversion par lot")
 
     def choose_input_file(self):
         file, _ = QFileDialog.getOpenFileName(self, "Choisir le fichier d'entrée")
@@ -513,70 +1020,159 @@ class YouTubeDownloader(QWidget):
             QMessageBox.warning(self, "Erreur", "Veuillez sélectionner les fichiers d'entrée et de sortie.")
             return
 
-        self.conversion_thread = ConversionThread(input_file, output_file, target_format)
+        self.conversion_thread = ConversionThread(input_file, output_file, target_format,
+                                                  self.conversion_threads_spin.value(),
+                                                  self.conversion_preset_combo.currentText(),
+                                                  self.segmented_conversion_checkbox.isChecked())
         self.conversion_thread.progress.connect(self.update_conversion_progress)
         self.conversion_thread.finished.connect(self.conversion_finished)
         self.conversion_thread.error.connect(self.show_conversion_error)
+        self.conversion_thread.cancelled.connect(self.conversion_cancelled)
         self.conversion_thread.start()
 
         self.convert_btn.setEnabled(False)
+        self.cancel_conversion_btn.setEnabled(True)
         self.conversion_label.setText("Conversion en cours...")
 
     def update_conversion_progress(self, progress):
         self.conversion_progress_bar.setValue(int(progress))
 
+    def cancel_conversion(self):
+        if self.conversion_thread:
+            self.conversion_thread.cancel()
+            self.cancel_conversion_btn.setEnabled(False)
+            self.conversion_label.setText("Annulation en cours...")
+
+    def conversion_cancelled(self):
+        self.convert_btn.setEnabled(True)
+        self.cancel_conversion_btn.setEnabled(False)
+        self.conversion_progress_bar.setValue(0)
+        self.conversion_label.setText("Conversion annulée")
+        self.log_message("Conversion annulée par l'utilisateur")
+
     def conversion_finished(self):
         self.conversion_progress_bar.setValue(100)
         self.convert_btn.setEnabled(True)
+        self.cancel_conversion_btn.setEnabled(False)
         self.conversion_label.setText("Conversion terminée!")
         QMessageBox.information(self, "Succès", "Conversion terminée avec succès!")
 
     def show_conversion_error(self, error_msg):
         QMessageBox.critical(self, "Erreur", f"Une erreur est survenue lors de la conversion : {error_msg}")
         self.convert_btn.setEnabled(True)
+        self.cancel_conversion_btn.setEnabled(False)
         self.conversion_label.setText("Erreur lors de la conversion")
         self.conversion_progress_bar.setValue(0)
 
+    def on_url_changed(self):
+        self.preview_timer.start(500)  # Démarrer le timer pour 500ms
+
     def start_validate_url(self):
-        if self.thumbnail_thread and self.thumbnail_thread.isRunning():
-            self.thumbnail_thread.terminate()
-            self.thumbnail_thread.wait()
+        url = self.url_input.text().strip()
+        if url == self.preview_url:
+            return
 
-        url = self.url_input.text()
+        # Les aperçus devenus inutiles sont annulés sans terminate() ; leur résultat sera ignoré
+        for pending_url in list(self.preview_threads):
+            if pending_url != url:
+                thread = self.preview_threads.pop(pending_url)
+                thread.cancel()
+                self.retired_preview_threads.append(thread)
+
+        self.preview_url = url
+        self.preview_done = False
+        self.current_title = ""
         if not url:
+            self.stop_spinner()
             self.preview_label.clear()
             self.title_label.clear()
             self.quality_combo.clear()
             return
 
-        self.spinner.start()
-        self.preview_label.setMovie(self.spinner)
+        self.start_spinner()
         self.title_label.setText("Chargement...")
         self.quality_combo.clear()
 
-        self.thumbnail_thread = ThumbnailThread(url)
-        self.thumbnail_thread.thumbnail_ready.connect(self.update_thumbnail)
-        self.thumbnail_thread.error.connect(self.show_thumbnail_error)
-        self.thumbnail_thread.is_playlist.connect(self.set_is_playlist)
-        self.thumbnail_thread.start()
+        if url in self.preview_threads:
+            # Une requête identique est déjà en cours : on partage son résultat
+            return
 
-    def update_thumbnail(self, pixmap, title, qualities):
-        self.spinner.stop()
+        retired = next((thread for thread in self.retired_preview_threads
+                        if thread.url == url and not thread.isFinished()), None)
+        if retired is not None:
+            # Retour à une URL dont l'aperçu écarté tourne encore : il est réadopté, pas relancé
+            retired.reinstate()
+            self.retired_preview_threads.remove(retired)
+            self.preview_threads[url] = retired
+            return
+        self.start_preview_thread(url)
+
+    def start_preview_thread(self, url):
+        thread = ThumbnailThread(url)
+        thread.thumbnail_ready.connect(lambda pixmap, title, qualities, url=url: self.update_thumbnail(url, pixmap, title, qualities))
+        thread.error.connect(lambda error, url=url: self.show_thumbnail_error(url, error))
+        thread.is_playlist.connect(lambda is_playlist, url=url: self.set_is_playlist(url, is_playlist))
+        thread.entry_count.connect(lambda entry_count, url=url: self.set_entry_count(url, entry_count))
+        thread.finished.connect(lambda thread=thread: self.preview_thread_finished(thread))
+        self.preview_threads[url] = thread
+        thread.start()
+
+    def start_spinner(self):
+        # spinner.gif n'est chargé qu'au premier aperçu
+        if self.spinner is None:
+            self.spinner = QMovie(resource_path("spinner.gif"))
+            self.spinner.setScaledSize(QSize(320, 180))
+        self.preview_label.setMovie(self.spinner)
+        self.spinner.start()
+
+    def stop_spinner(self):
+        if self.spinner is not None:
+            self.spinner.stop()
+
+    def preview_thread_finished(self, thread):
+        if self.preview_threads.get(thread.url) is thread:
+            del self.preview_threads[thread.url]
+        if thread in self.retired_preview_threads:
+            self.retired_preview_threads.remove(thread)
+        if thread.url == self.preview_url and not self.preview_done and thread.url not in self.preview_threads:
+            # Aperçu réadopté trop tard (il avait déjà abandonné) : relance, le plus souvent
+            # servie par le cache de métadonnées
+            self.start_preview_thread(thread.url)
+
+    def update_thumbnail(self, url, pixmap, title, qualities):
+        if url != self.preview_url:
+            return
+        self.preview_done = True
+        self.stop_spinner()
         scaled_pixmap = pixmap.scaled(320, 180, Qt.KeepAspectRatio, Qt.SmoothTransformation)
         self.preview_label.setPixmap(scaled_pixmap)
-        self.title_label.setText(title)
+        if self.is_playlist:
+            count = self.entry_count if self.entry_count else "?"
+            self.title_label.setText(f"{title}\n(Playlist : {count} vidéos)")
+        else:
+            self.title_label.setText(title)
+        self.current_title = title
         self.quality_combo.clear()
         self.quality_combo.addItems(qualities)
 
-    def show_thumbnail_error(self, error):
-        self.spinner.stop()
+    def show_thumbnail_error(self, url, error):
+        if url != self.preview_url:
+            return
+        self.preview_done = True
+        self.stop_spinner()
         self.preview_label.setText("URL non valide ou erreur lors de la récupération des informations")
         self.title_label.clear()
+        self.current_title = ""
         self.quality_combo.clear()
         self.log_message(f"Erreur lors de la récupération de la miniature : {error}")
 
-    def set_is_playlist(self, is_playlist):
-        self.is_playlist = is_playlist
+    def set_is_playlist(self, url, is_playlist):
+        if url == self.preview_url:
+            self.is_playlist = is_playlist
+
+    def set_entry_count(self, url, entry_count):
+        if url == self.preview_url:
+            self.entry_count = entry_count
 
     def start_download(self):
         url = self.url_input.text()
@@ -584,75 +1180,164 @@ class YouTubeDownloader(QWidget):
             QMessageBox.warning(self, "Erreur", "Veuillez entrer une URL valide.")
             return
 
-        save_path = QFileDialog.getExistingDirectory(self, "Sélectionner le dossier de sauvegarde", self.default_save_path_edit.text())
+        save_path = QFileDialog.getExistingDirectory(self, "Sélectionner le dossier de sauvegarde",
+                                                     self.settings.value("default_save_path", ""))
         if not save_path:
             return
 
         quality = self.quality_combo.currentText()
         extract_audio = self.extract_audio_checkbox.isChecked()
 
-        self.progress_bar.setValue(5)  # Commence à 5% pour indiquer que le téléchargement a débuté
-        self.progress_label.setText("Démarrage du téléchargement...")
-
-        self.download_thread = DownloadThread(url, save_path, quality, self.is_playlist, extract_audio)
-        self.download_thread.progress.connect(self.update_progress)
-        self.download_thread.finished.connect(self.download_finished)
-        self.download_thread.error.connect(self.show_error)
-        self.download_thread.start()
+        convert_format = self.auto_convert_format_combo.currentText() if self.auto_convert_checkbox.isChecked() else None
+        job = DownloadJob(url, save_path, quality, self.is_playlist, extract_audio,
+                          self.setting_bool("keep_partial_files", True), convert_format,
+                          self.audio_codec_combo.currentText(), self.setting_int("connections_per_file", 1),
+                          self.setting_int("fragment_connections", 4), self.setting_bool("use_download_archive", False))
+        if self.current_title:
+            job.title = self.current_title
+        self.download_manager.submit(job)
+        self.log_message(f"Ajouté à la file d'attente : {job.title}")
+
+    def job_item(self, job_id):
+        for row in range(self.queue_list.count()):
+            item = self.queue_list.item(row)
+            if item.data(Qt.UserRole) == job_id:
+                return item
+        return None
+
+    def selected_job(self):
+        item = self.queue_list.currentItem()
+        if item is None:
+            return None
+        return self.download_manager.queue.get(item.data(Qt.UserRole))
+
+    def refresh_job_item(self, job_id):
+        job = self.download_manager.queue.get(job_id)
+        item = self.job_item(job_id)
+        if job is None:
+            if item is not None:
+                self.queue_list.takeItem(self.queue_list.row(item))
+            return
 
-        self.download_btn.setEnabled(False)
-        self.pause_resume_btn.setEnabled(True)
-        self.stop_btn.setEnabled(True)
+        state_labels = {
+            QUEUED: "En attente",
+            RUNNING: "En cours",
+            PAUSED: "En pause",
+            FINISHED: "Terminé",
+            STOPPED: "Arrêté",
+            FAILED: "Erreur",
+        }
+        text = f"[{state_labels[job.state]}] {job.title} - {job.progress:.1f}%"
+        if item is None:
+            item = QListWidgetItem(text)
+            item.setData(Qt.UserRole, job_id)
+            self.queue_list.addItem(item)
+            if self.queue_list.currentItem() is None:
+                self.queue_list.setCurrentItem(item)
+        else:
+            item.setText(text)
+
+        # Garder l'ordre de la liste synchronisé avec les priorités de la file
+        row = self.queue_list.row(item)
+        index = self.download_manager.queue.jobs.index(job)
+        if row != index:
+            selected = self.queue_list.currentItem() is item
+            self.queue_list.takeItem(row)
+            self.queue_list.insertItem(index, item)
+            if selected:
+                self.queue_list.setCurrentItem(item)
+
+        if self.selected_job() is job:
+            self.on_job_selected()
+
+    def on_job_selected(self, *args):
+        job = self.selected_job()
+        if job is None:
+            self.pause_resume_btn.setEnabled(False)
+            self.stop_btn.setEnabled(False)
+            self.progress_bar.setValue(0)
+            self.progress_label.clear()
+            return
 
-    def update_progress(self, progress):
-        self.progress_bar.setValue(int(progress))
-        if self.is_playlist:
-            self.progress_label.setText(f"Progression totale: {progress:.1f}%")
+        self.pause_resume_btn.setEnabled(job.state in ACTIVE_STATES)
+        self.pause_resume_btn.setText('Reprendre' if job.state == PAUSED else 'Pause')
+        self.stop_btn.setEnabled(job.state in (QUEUED,) + ACTIVE_STATES)
+        self.progress_bar.setValue(int(job.progress))
+        if job.state == FINISHED:
+            self.progress_label.setText("Téléchargement terminé!")
+        elif job.state == STOPPED:
+            self.progress_label.setText("Téléchargement arrêté")
+        elif job.state == FAILED:
+            self.progress_label.setText("Erreur lors du téléchargement")
+        elif job.state == PAUSED:
+            self.progress_label.setText("Téléchargement en pause")
+        elif job.state == QUEUED:
+            self.progress_label.setText("En attente d'un emplacement libre...")
+        elif job.is_playlist:
+            remaining = format_size(job.remaining) if job.remaining and job.remaining > 0 else "-"
+            self.progress_label.setText(f"Progression totale: {job.progress:.1f}% - {format_speed(job.speed)} - "
+                                        f"reste {remaining} - ETA {format_eta(job.eta)}")
         else:
-            self.progress_label.setText(f"Progression: {progress:.1f}%")
+            self.progress_label.setText(f"Progression: {job.progress:.1f}% - {format_speed(job.speed)} - ETA {format_eta(job.eta)}")
+
+    def move_selected_job(self, offset):
+        job = self.selected_job()
+        if job:
+            self.download_manager.move(job.job_id, offset)
+
+    def clear_done_jobs(self):
+        self.download_manager.queue.clear_done()
+        for row in reversed(range(self.queue_list.count())):
+            item = self.queue_list.item(row)
+            if self.download_manager.queue.get(item.data(Qt.UserRole)) is None:
+                self.queue_list.takeItem(row)
+
+    def update_progress(self, job_id, progress):
+        self.refresh_job_item(job_id)
 
     def download_finished(self):
-        self.progress_bar.setValue(100)
-        self.download_btn.setEnabled(True)
-        self.pause_resume_btn.setEnabled(False)
-        self.stop_btn.setEnabled(False)
-        self.progress_label.setText("Téléchargement terminé!")
-        QMessageBox.information(self, "Succès", "Téléchargement terminé!")
         self.log_message("Téléchargement terminé avec succès")
+        QMessageBox.information(self, "Succès", "Téléchargement terminé!")
 
-    def show_error(self, error_msg):
+    def show_error(self, job_id, error_msg):
+        job = self.download_manager.queue.get(job_id)
+        title = job.title if job else job_id
         QMessageBox.critical(self, "Erreur", f"Une erreur est survenue : {error_msg}")
-        self.download_btn.setEnabled(True)
-        self.pause_resume_btn.setEnabled(False)
-        self.stop_btn.setEnabled(False)
-        self.progress_label.setText("Erreur lors du téléchargement")
-        self.progress_bar.setValue(0)
-        self.log_message(f"Erreur lors du téléchargement : {error_msg}")
+        self.log_message(f"Erreur lors du téléchargement de {title} : {error_msg}")
+
+    def show_job_message(self, job_id, message):
+        job = self.download_manager.queue.get(job_id)
+        self.log_message(f"{job.title if job else job_id} : {message}")
+
+    def show_pipeline_status(self, file, status, message):
+        if status == 'running':
+            self.log_message(f"Conversion automatique en cours : {file}")
+        elif status == 'done':
+            self.log_message(f"Conversion automatique terminée : {message}")
+        elif status == 'failed':
+            self.log_message(f"Erreur lors de la conversion automatique de {file} : {message}")
 
     def toggle_pause_resume(self):
-        if self.download_thread.paused:
-            self.download_thread.resume()
-            self.pause_resume_btn.setText('Pause')
-            self.progress_label.setText("Téléchargement repris")
-            self.log_message("Téléchargement repris")
+        job = self.selected_job()
+        if job is None:
+            return
+        if job.state == PAUSED:
+            self.download_manager.resume(job.job_id)
+            self.log_message(f"Téléchargement repris : {job.title}")
         else:
-            self.download_thread.pause()
-            self.pause_resume_btn.setText('Reprendre')
-            self.progress_label.setText("Téléchargement en pause")
-            self.log_message("Téléchargement mis en pause")
+            self.download_manager.pause(job.job_id)
+            self.log_message(f"Téléchargement mis en pause : {job.title}")
 
     def stop_download(self):
-        if self.download_thread:
-            self.download_thread.stop()
-            self.download_thread.wait()
-        self.download_btn.setEnabled(True)
-        self.pause_resume_btn.setEnabled(False)
-        self.stop_btn.setEnabled(False)
-        self.progress_label.setText("Téléchargement arrêté")
-        self.progress_bar.setValue(0)
-        self.log_message("Téléchargement arrêté par l'utilisateur")
+        job = self.selected_job()
+        if job is None:
+            return
+        self.download_manager.stop(job.job_id)
+        self.log_message(f"Téléchargement arrêté par l'utilisateur : {job.title}")
 
 if __name__ == '__main__':
+    # Nécessaire pour le pool de processus dans l'exécutable PyInstaller
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     ex = YouTubeDownloader()
     ex.show()
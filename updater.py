@@ -0,0 +1,127 @@
+import hashlib
+import os
+import re
+import requests
+from cancel import Cancelled, CancelToken
+from http_pool import get_session
+
+CHUNK_SIZE = 1024 * 1024
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+MAX_ATTEMPTS = 5
+CHECKSUM_ASSET_NAMES = ('{name}.sha256', 'SHA256SUMS', 'SHA256SUMS.txt', 'checksums.txt')
+
+
+class ChecksumError(Exception):
+    pass
+
+
+def find_checksum_url(release, asset_name):
+    # Somme publiée à côté de l'exécutable : « <nom>.sha256 » ou un fichier de sommes commun
+    assets = {asset['name']: asset['browser_download_url'] for asset in release.get('assets', [])}
+    for pattern in CHECKSUM_ASSET_NAMES:
+        name = pattern.format(name=asset_name)
+        if name in assets:
+            return assets[name]
+    return None
+
+
+def parse_checksum(text, filename):
+    # Formats acceptés : « <hex> » seul ou lignes « <hex>  <fichier> » (sha256sum)
+    for line in text.splitlines():
+        match = re.match(r'^([0-9a-fA-F]{64})(?:\s+\*?(.+))?$', line.strip())
+        if match and (match.group(2) is None or os.path.basename(match.group(2).strip()) == filename):
+            return match.group(1).lower()
+    raise ChecksumError(f"Somme SHA-256 introuvable pour {filename}")
+
+
+def fetch_checksum(checksum_url, filename, session=None):
+    response = (session or get_session()).get(checksum_url, timeout=30)
+    response.raise_for_status()
+    return parse_checksum(response.text, filename)
+
+
+class UpdateDownloader:
+    # Téléchargement de la mise à jour dans <destination>.part, repris par requête Range
+    # après une interruption, puis vérifié (SHA-256) avant d'être renommé
+    def __init__(self, url, destination, expected_sha256=None, checksum_url=None, session=None,
+                 on_progress=None, cancel_token=None):
+        self.url = url
+        self.destination = destination
+        self.part_path = destination + '.part'
+        self.expected_sha256 = expected_sha256
+        self.checksum_url = checksum_url
+        self.session = session or get_session()
+        self.on_progress = on_progress
+        self.cancel_token = cancel_token or CancelToken()
+
+    def expected_digest(self):
+        if self.expected_sha256:
+            return self.expected_sha256.lower()
+        if not self.checksum_url:
+            raise ChecksumError("Aucune somme de contrôle publiée pour cette mise à jour")
+        return fetch_checksum(self.checksum_url, os.path.basename(self.url.split('?', 1)[0]), self.session)
+
+    def hash_existing(self, digest):
+        # Les octets déjà reçus entrent dans le calcul avant la reprise
+        if not os.path.exists(self.part_path):
+            return 0
+        with open(self.part_path, 'rb') as f:
+            while True:
+                self.cancel_token.raise_if_cancelled()
+                block = f.read(CHUNK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+        return os.path.getsize(self.part_path)
+
+    def transfer(self, digest, offset):
+        # Une seule requête ; renvoie l'empreinte, remise à zéro si le serveur ignore Range
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        with self.session.get(self.url, headers=headers, stream=True, timeout=30) as response:
+            if offset and response.status_code == 416:
+                return digest  # Déjà complet
+            response.raise_for_status()
+            if offset and response.status_code != 206:
+                # Range ignoré par le serveur : on repart de zéro
+                digest = hashlib.sha256()
+                offset = 0
+            length = response.headers.get('Content-Length')
+            total = offset + int(length) if length else None
+            received = offset
+            with open(self.part_path, 'ab' if offset else 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    self.cancel_token.raise_if_cancelled()
+                    f.write(chunk)
+                    digest.update(chunk)
+                    received += len(chunk)
+                    if self.on_progress:
+                        self.on_progress(received, total)
+            if total is not None and received < total:
+                raise requests.ConnectionError("Transfert interrompu")
+            return digest
+
+    def run(self):
+        expected = self.expected_digest()
+        attempt = 0
+        while True:
+            digest = hashlib.sha256()
+            offset = self.hash_existing(digest)
+            try:
+                digest = self.transfer(digest, offset)
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                attempt += 1
+                if attempt >= MAX_ATTEMPTS:
+                    raise
+                if self.cancel_token.wait(min(2 ** attempt, 30)):
+                    raise Cancelled()
+
+        if digest.hexdigest() != expected:
+            # Fichier corrompu ou altéré : il ne doit pas servir de base à une reprise
+            os.remove(self.part_path)
+            raise ChecksumError("La somme SHA-256 de la mise à jour ne correspond pas")
+        os.replace(self.part_path, self.destination)
+        return self.destination
+
+    def cancel(self):
+        self.cancel_token.cancel()
@@ -0,0 +1,113 @@
+import collections
+import contextlib
+import json
+import threading
+import yt_dlp
+
+# Options propres à chaque utilisation : elles ne changent pas l'instance réutilisée
+LEASE_HOOKS = ('progress_hooks', 'post_hooks')
+LEASE_PARAMS = ('bandwidth',)
+MAX_IDLE = 6
+
+
+def options_signature(cls, options):
+    stable = {key: value for key, value in options.items() if key not in LEASE_HOOKS + LEASE_PARAMS}
+    return cls.__qualname__ + json.dumps(stable, sort_keys=True,
+                                         default=lambda value: f"{type(value).__name__}@{id(value)}")
+
+
+class HookDispatcher:
+    # Hooks enregistrés une seule fois dans l'instance ; ils relaient vers ceux du travail courant
+    def __init__(self):
+        self.progress_hooks = []
+        self.post_hooks = []
+
+    def progress(self, d):
+        for hook in self.progress_hooks:
+            hook(d)
+
+    def post(self, filepath):
+        for hook in self.post_hooks:
+            hook(filepath)
+
+
+class YoutubeDLPool:
+    # Instances YoutubeDL déjà configurées (extracteurs chargés, cookies en mémoire), prêtées
+    # à un seul worker à la fois et rangées par signature d'options
+    def __init__(self, max_idle=MAX_IDLE):
+        self.max_idle = max_idle
+        self.idle = collections.OrderedDict()
+        self.dispatchers = {}
+        self._lock = threading.Lock()
+
+    def _create(self, cls, options):
+        dispatcher = HookDispatcher()
+        params = {key: value for key, value in options.items() if key not in LEASE_HOOKS}
+        params['progress_hooks'] = [dispatcher.progress]
+        params['post_hooks'] = [dispatcher.post]
+        ydl = cls(params)
+        with self._lock:
+            self.dispatchers[id(ydl)] = dispatcher
+        return ydl
+
+    @contextlib.contextmanager
+    def acquire(self, options, cls=yt_dlp.YoutubeDL):
+        signature = options_signature(cls, options)
+        with self._lock:
+            instances = self.idle.get(signature)
+            ydl = instances.pop() if instances else None
+            if instances is not None and not instances:
+                del self.idle[signature]
+        if ydl is None:
+            ydl = self._create(cls, options)
+
+        with self._lock:
+            dispatcher = self.dispatchers[id(ydl)]
+        dispatcher.progress_hooks = list(options.get('progress_hooks') or [])
+        dispatcher.post_hooks = list(options.get('post_hooks') or [])
+        for key in LEASE_PARAMS:
+            ydl.params[key] = options.get(key)
+        try:
+            yield ydl
+        finally:
+            dispatcher.progress_hooks = []
+            dispatcher.post_hooks = []
+            for key in LEASE_PARAMS:
+                ydl.params[key] = None
+            self._release(signature, ydl)
+
+    def _release(self, signature, ydl):
+        evicted = []
+        with self._lock:
+            self.idle.setdefault(signature, []).append(ydl)
+            self.idle.move_to_end(signature)
+            while sum(len(instances) for instances in self.idle.values()) > self.max_idle:
+                # Les signatures les moins récemment utilisées partent d'abord
+                oldest = next(iter(self.idle))
+                evicted.append(self.idle[oldest].pop(0))
+                if not self.idle[oldest]:
+                    del self.idle[oldest]
+            for instance in evicted:
+                self.dispatchers.pop(id(instance), None)
+        for instance in evicted:
+            instance.close()
+
+    def close(self):
+        with self._lock:
+            instances = [ydl for group in self.idle.values() for ydl in group]
+            self.idle.clear()
+            self.dispatchers.clear()
+        for ydl in instances:
+            ydl.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ydl_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = YoutubeDLPool()
+        return _pool